@@ -1,47 +1,172 @@
 from ast import literal_eval
-from datetime import datetime
 
 import numpy as np
 import pandas as pd
 
+from data_validation import reason_codes
+
+try:
+    import pyarrow  # noqa: F401
+
+    STRING_DTYPE = pd.StringDtype("pyarrow")
+except ImportError:
+    STRING_DTYPE = None
+
 
 class DataCleaning:
     """
     This class provides methods for cleaning various types of data in pandas DataFrames.
     It includes functions to clean strings, dates, addresses, and more, ensuring data integrity
     and consistency across different datasets.
+
+    Rows dropped during cleaning are kept, with their reason codes, in ``rejected_rows``.
     """
 
+    DATE_FORMATS = ("%Y-%m-%d", "%Y-%m-%d %H:%M:%S", "%Y/%m/%d", "%B %Y %d", "%Y %B %d")
+    WEIGHT_CLASS_BINS = (0, 2, 40, 140, float("inf"))
+    WEIGHT_CLASSES = ("Light", "Mid_Sized", "Heavy", "Truck_Required")
+    SURROGATE_KEYS = {
+        "dim_card_details": ("card_number", "card_key"),
+        "dim_date_times": ("date_uuid", "date_key"),
+        "dim_products": ("product_code", "product_key"),
+        "dim_store_details": ("store_code", "store_key"),
+        "dim_users_table": ("user_uuid", "user_key"),
+    }
+
     def __init__(self) -> None:
         """
         Initializes an instance of the DataCleaning class.
         """
-        pass
+        self.rejected_rows = []
 
-    def clean_unknown_string(self, df):
+    def drop_rows(self, df, masks):
         """
-        Removes rows in the DataFrame where any column matches a specific regex pattern.
+        Drops rows flagged by any of the given masks, keeping them with their reason codes.
 
         Parameters:
-        df (DataFrame): The DataFrame to be cleaned.
+        df (DataFrame): The DataFrame to drop rows from.
+        masks (dict): A dictionary mapping each reason code to a boolean Series flagging the rows to drop.
+        """
+        codes = reason_codes(masks)
+        if codes.empty:
+            return
+        self.rejected_rows.append(df.loc[codes.index].assign(reason_codes=codes))
+        df.drop(index=codes.index, inplace=True)
+
+    def pop_rejected_rows(self):
+        """
+        Returns the rows dropped so far and clears them.
+
+        Returns:
+        DataFrame: The dropped rows, with a "reason_codes" column.
+        """
+        if not self.rejected_rows:
+            return pd.DataFrame(columns=["reason_codes"])
+        rejected_df = pd.concat(self.rejected_rows)
+        self.rejected_rows = []
+        return rejected_df
+
+    def as_string(self, series):
+        """
+        Converts a Series to Arrow-backed strings when pyarrow is installed, so that string
+        methods run in Arrow compute kernels instead of per-element Python calls.
+
+        Parameters:
+        series (Series): The Series to be converted.
+
+        Returns:
+        Series: The Series as strings, with missing values kept missing.
+        """
+        if STRING_DTYPE is None:
+            return series.where(series.isna(), series.astype(str))
+        return series.astype(STRING_DTYPE)
+
+    def unknown_string_mask(self, df):
+        """
+        Flags the values in the DataFrame that match the unknown string pattern.
+
+        Parameters:
+        df (DataFrame): The DataFrame to be checked.
+
+        Returns:
+        DataFrame: A boolean DataFrame that is True for the matching values.
         """
         mask = r"^[A-Z0-9]{10}$"
+        return pd.DataFrame(
+            {
+                column: self.as_string(df[column]).str.contains(mask, na=False)
+                for column in df.columns
+            },
+            index=df.index,
+        )
+
+    def clean_unknown_string(self, df, required=()):
+        """
+        Removes values in the DataFrame where any column matches a specific regex pattern.
+
+        Rows with an unknown string in a required column are dropped first, with the reason code
+        UNKNOWN_STRING, so they are kept with their original values rather than as missing values.
+
+        Parameters:
+        df (DataFrame): The DataFrame to be cleaned.
+        required (list): The columns a row cannot be used without, e.g. ["address"].
+        """
+        unknown = self.unknown_string_mask(df)
+        if len(required):
+            self.drop_rows(df, {"UNKNOWN_STRING": unknown[list(required)].any(axis=1)})
+            unknown = unknown.loc[df.index]
         for column in df.columns:
-            df[column] = df[column][
-                ~df[column].astype(str).str.contains(mask, na=False)
-            ]
+            df[column] = df[column][~unknown[column]]
+
+    def parse_dates(self, series):
+        """
+        Parses a Series of date strings, trying the known formats before falling back to mixed inference.
+
+        Each distinct value is parsed only once and the result is mapped back onto the Series,
+        so repeated dates cost a single parse. Only values none of the known formats match
+        are sent to the slow per-element ``format="mixed"`` path.
+
+        Parameters:
+        series (Series): The Series of dates to be parsed.
+
+        Returns:
+        Series: The parsed dates, with NaT for values that could not be parsed.
+        """
+        if pd.api.types.is_datetime64_any_dtype(series):
+            return series
+        uniques = pd.Series(series.dropna().unique())
+        parsed = pd.Series(pd.NaT, index=uniques.index, dtype="datetime64[ns]")
+        for date_format in self.DATE_FORMATS:
+            pending = parsed.isna()
+            if not pending.any():
+                break
+            parsed[pending] = pd.to_datetime(
+                uniques[pending], errors="coerce", format=date_format
+            )
+        pending = parsed.isna()
+        if pending.any():
+            parsed[pending] = pd.to_datetime(
+                uniques[pending], errors="coerce", format="mixed"
+            )
+        lookup = pd.Series(parsed.values, index=uniques.values)
+        return series.map(lookup).astype("datetime64[ns]")
 
     def clean_dates(self, df):
         """
         Converts string dates to datetime objects and drops rows with invalid dates.
 
+        The number of rows dropped for each date column is printed.
+
         Parameters:
         df (DataFrame): The DataFrame to be cleaned.
         """
         for column in df.columns:
             if "date" in column:
-                df[column] = pd.to_datetime(df[column], errors="coerce", format="mixed")
-                df.dropna(subset=[column], inplace=True)
+                parsed = self.parse_dates(df[column])
+                invalid = parsed.isna()
+                self.drop_rows(df, {f"INVALID_{column.upper()}": invalid})
+                df[column] = parsed[~invalid]
+                print(f"{column}: dropped {invalid.sum()} rows with invalid dates.")
 
     def clean_address(self, df):
         """
@@ -50,12 +175,10 @@ class DataCleaning:
         Parameters:
         df (DataFrame): The DataFrame to be cleaned.
         """
-        df.dropna(subset=["address"], inplace=True)
-
-        def clean_single_address(address):
-            return address.replace("\n", ", ") if "\n" in address else address
-
-        df["address"] = df["address"].apply(clean_single_address)
+        self.drop_rows(df, {"MISSING_ADDRESS": df["address"].isna()})
+        df["address"] = self.as_string(df["address"]).str.replace(
+            "\n", ", ", regex=False
+        )
 
     def reset_index_col(self, df, index_col):
         """
@@ -81,7 +204,7 @@ class DataCleaning:
         index_col (str): The column to set as the new index.
         """
         self.clean_dates(df)
-        self.clean_unknown_string(df)
+        self.clean_unknown_string(df, required=["address"])
         self.clean_address(df)
         self.reset_index_col(df, index_col=index_col)
         df.loc[df["country_code"] == "GGB", "country_code"] = "GB"
@@ -90,15 +213,20 @@ class DataCleaning:
         """
         Cleans credit card data by removing NaN values and applying string cleaning.
 
+        Rows with missing values, unknown strings or repeated header values are dropped in one pass.
+
         Parameters:
         df (DataFrame): The DataFrame containing card data to be cleaned.
         """
-        df.dropna(inplace=True)
-        self.clean_unknown_string(df)
-        for column in df.columns:
-            mask = df[column] == column
-            df.loc[mask, column] = np.nan
-        df.dropna(inplace=True)
+        headers = pd.Series(df.columns, index=df.columns)
+        self.drop_rows(
+            df,
+            {
+                "MISSING_VALUE": df.isna().any(axis=1),
+                "UNKNOWN_STRING": self.unknown_string_mask(df).any(axis=1),
+                "HEADER_ROW": df.eq(headers, axis="columns").any(axis=1),
+            },
+        )
         df.loc[:, "card_number"] = df.loc[:, "card_number"].str.replace(
             r"[\?]+", "", regex=True
         )
@@ -107,22 +235,27 @@ class DataCleaning:
         """
         Cleans store data, adjusting fields specific to different types of stores.
 
+        Each column is rewritten in a single vectorised pass, with the Web Portal overrides
+        applied as masks on the same pass rather than as separate writes.
+
         Parameters:
         df (DataFrame): The DataFrame containing store data to be cleaned.
         index_col (str): The column to set as the new index.
         """
-        self.clean_unknown_string(df)
+        self.clean_unknown_string(df, required=["address"])
         self.clean_address(df)
         self.clean_dates(df)
-        mask = df["store_type"] == "Web Portal"
-        df.loc[mask, "continent"] = "N/A"
-        df.loc[mask, "longitude"] = np.nan
-        df.loc[mask, "latitude"] = np.nan
-        df.loc[mask, "address"] = "N/A"
-        df.loc[:, "staff_numbers"] = df["staff_numbers"].str.replace(
+        web_portal = df["store_type"] == "Web Portal"
+        df["address"] = df["address"].mask(web_portal, "N/A")
+        df[["longitude", "latitude"]] = df[["longitude", "latitude"]].mask(web_portal)
+        df["staff_numbers"] = self.as_string(df["staff_numbers"]).str.replace(
             r"[A-Za-z]+", "", regex=True
         )
-        df.loc[:, "continent"] = df["continent"].str.replace(r"^[a-z]+", "", regex=True)
+        df["continent"] = (
+            self.as_string(df["continent"])
+            .str.replace(r"^[a-z]+", "", regex=True)
+            .mask(web_portal, "N/A")
+        )
         self.reset_index_col(df, index_col=index_col)
 
     def convert_product_weights(self, df):
@@ -133,7 +266,7 @@ class DataCleaning:
         df (DataFrame): The DataFrame containing product weight data to be converted.
         """
         unit_factors = {"g": 0.001, "ml": 0.001, "oz": 0.028349523125, "kg": 1}
-        df.dropna(subset=["weight"], inplace=True)
+        self.drop_rows(df, {"MISSING_WEIGHT": df["weight"].isna()})
         df["weight"] = df["weight"].str.replace(" ", "")
         df["weight"] = df["weight"].str.replace("x", "*")
         df["weight_unit"] = df["weight"].str.extract(r"([a-zA-Z]+)")
@@ -148,16 +281,35 @@ class DataCleaning:
 
     def clean_products_data(self, df):
         """
-        Cleans products data, including categories and pricing.
+        Cleans products data, including categories, pricing and weight classes.
+
+        The price is made numeric, the "removed" column becomes a "still_available" flag and each
+        product gets a weight class, so the table is loaded with its final columns and types.
 
         Parameters:
         df (DataFrame): The DataFrame containing products data to be cleaned.
         """
         self.clean_dates(df)
-        df["removed"] = df["removed"] == "Removed"
+        df.insert(
+            df.columns.get_loc("removed"),
+            "still_available",
+            df.pop("removed") != "Removed",
+        )
         df["category"] = df["category"].astype("category")
-        df["weight"] = df["weight"].round(3)
-        df["product_price"] = df["product_price"].str.replace("£", "")
+        df["weight"] = df["weight"].round(3).astype("float32")
+        df.insert(
+            df.columns.get_loc("weight") + 1,
+            "weight_class",
+            pd.cut(
+                df["weight"],
+                bins=self.WEIGHT_CLASS_BINS,
+                labels=self.WEIGHT_CLASSES,
+                right=False,
+            ),
+        )
+        df["product_price"] = pd.to_numeric(
+            df["product_price"].str.replace("£", "", regex=False)
+        ).astype("float32")
 
     def clean_orders_data(self, df):
         """
@@ -168,22 +320,105 @@ class DataCleaning:
         """
         df.drop(columns=["first_name", "last_name", "1", "level_0"], inplace=True)
 
+    def add_order_date(self, df, date_df):
+        """
+        Adds the order date to orders data by looking up each order's date_uuid in the date data.
+
+        Orders whose date_uuid is not in the date data get a missing order date.
+
+        Parameters:
+        df (DataFrame): The DataFrame containing orders data.
+        date_df (DataFrame): The DataFrame containing the cleaned date data, with "date_uuid" and "datetime" columns.
+        """
+        order_dates = pd.Series(
+            pd.to_datetime(date_df["datetime"]).dt.normalize().values,
+            index=date_df["date_uuid"].astype(str),
+        )
+        df["order_date"] = df["date_uuid"].astype(str).map(order_dates)
+
+    def add_row_hash(self, df, hash_column="row_hash"):
+        """
+        Adds a 64-bit content hash of every row, used to detect the rows that changed between loads.
+
+        Parameters:
+        df (DataFrame): The DataFrame containing dimension data, before surrogate keys are assigned.
+        hash_column (str): The name of the hash column to add.
+        """
+        df[hash_column] = (
+            pd.util.hash_pandas_object(df, index=False).to_numpy().view("int64")
+        )
+
+    def assign_surrogate_keys(self, df, natural_key, surrogate_key, key_lookup=None):
+        """
+        Adds a compact integer surrogate key column to dimension data.
+
+        Natural keys already in ``key_lookup`` keep their surrogate key, so keys stay stable across
+        reloads; new natural keys are numbered on from the largest existing key.
+
+        Parameters:
+        df (DataFrame): The DataFrame containing dimension data.
+        natural_key (str): The natural key column, e.g. "store_code".
+        surrogate_key (str): The surrogate key column to add, e.g. "store_key".
+        key_lookup (dict): The existing natural key to surrogate key mapping, if any.
+
+        Returns:
+        dict: The natural key to surrogate key mapping, including the new keys.
+        """
+        key_lookup = dict(key_lookup or {})
+        natural_keys = df[natural_key].astype(str)
+        new_keys = natural_keys[~natural_keys.isin(key_lookup)].unique()
+        next_key = max(key_lookup.values(), default=0) + 1
+        key_lookup.update(zip(new_keys, range(next_key, next_key + len(new_keys))))
+        df.insert(0, surrogate_key, natural_keys.map(key_lookup).astype("int32"))
+        return key_lookup
+
+    def apply_surrogate_keys(self, df, key_lookups):
+        """
+        Replaces the natural foreign keys in orders data with the dimension surrogate keys.
+
+        The number of orders whose natural key has no surrogate key is printed; their surrogate key is missing.
+
+        Parameters:
+        df (DataFrame): The DataFrame containing orders data.
+        key_lookups (dict): A dictionary mapping each natural key column to a (surrogate key column, lookup dict) pair.
+        """
+        for natural_key, (surrogate_key, key_lookup) in key_lookups.items():
+            surrogate_keys = df[natural_key].astype(str).map(key_lookup)
+            df.insert(
+                df.columns.get_loc(natural_key),
+                surrogate_key,
+                surrogate_keys.astype("Int32"),
+            )
+            df.drop(columns=[natural_key], inplace=True)
+            print(f"{natural_key}: {surrogate_keys.isna().sum()} rows without a key.")
+
     def clean_date_data(self, df):
         """
         Cleans and standardizes date and time data in the DataFrame.
 
+        Each sale also gets the number of seconds until the next sale of the same year, found by
+        sorting on the year and time and shifting, so the time between sales is a plain aggregate.
+
         Parameters:
         df (DataFrame): The DataFrame containing date and time data to be cleaned.
         """
-        self.clean_unknown_string(df)
+        self.clean_unknown_string(df, required=df.columns)
         df.replace("NULL", np.nan, inplace=True)
-        df.dropna(inplace=True)
-        df["datetime"] = df.apply(
-            lambda row: datetime.strptime(
-                f"{row['year']}-{row['month']}-{row['day']} {row['timestamp']}",
-                "%Y-%m-%d %H:%M:%S",
-            ),
-            axis=1,
+        self.drop_rows(df, {"MISSING_VALUE": df.isna().any(axis=1)})
+        df["datetime"] = pd.to_datetime(
+            df["year"].astype(str)
+            + "-"
+            + df["month"].astype(str)
+            + "-"
+            + df["day"].astype(str)
+            + " "
+            + df["timestamp"].astype(str),
+            format="%Y-%m-%d %H:%M:%S",
         )
         df.drop(columns=["timestamp"], inplace=True)
+        ordered = df[["year", "datetime"]].sort_values(["year", "datetime"])
+        next_sale = ordered.groupby("year", sort=False)["datetime"].shift(-1)
+        df["seconds_to_next_sale"] = (
+            next_sale - ordered["datetime"]
+        ).dt.total_seconds()
         df["time_period"] = df["time_period"].astype("category")
@@ -0,0 +1,503 @@
+import duckdb
+
+from data_cleaning import DataCleaning
+
+
+class DuckDBDataCleaning:
+    """
+    This class provides the DataCleaning transformations on a lazy, out-of-core DuckDB engine.
+
+    The methods have the same names and semantics as those of DataCleaning, but take the name of a
+    table registered with ``register_source`` instead of a DataFrame. Like the in-place pandas methods,
+    each call replaces the named table with its cleaned version. The replacement is a view stacked on
+    the previous one, so nothing is computed until the result is read with ``record_batches``.
+    DuckDB then streams the sources through every step within ``memory_limit``, spilling to
+    ``temp_directory`` when an operator needs more memory.
+
+    Rows dropped during cleaning are kept, with their reason codes, and can be read with ``rejected_batches``.
+    """
+
+    FALLBACK_DATE_FORMATS = (
+        "%m/%d/%Y",
+        "%d/%m/%Y",
+        "%d %B %Y",
+        "%B %d %Y",
+        "%B %d, %Y",
+    )
+
+    def __init__(self, memory_limit="2GB", temp_directory=".duckdb_tmp", threads=None):
+        """
+        Initializes an instance of the DuckDBDataCleaning class.
+
+        Args:
+            memory_limit (str, optional): The memory budget of the DuckDB engine. Defaults to "2GB".
+            temp_directory (str, optional): The directory DuckDB spills to when the budget is exceeded.
+            threads (int, optional): The number of DuckDB worker threads. Defaults to one per core.
+        """
+        self.conn = duckdb.connect()
+        self.conn.execute(f"SET memory_limit = '{memory_limit}'")
+        self.conn.execute(f"SET temp_directory = '{temp_directory}'")
+        self.conn.execute("SET preserve_insertion_order = false")
+        if threads is not None:
+            self.conn.execute(f"SET threads = {int(threads)}")
+        self.versions = {}
+        self.rejected_views = {}
+
+    @staticmethod
+    def quote(identifier):
+        """
+        Quotes an SQL identifier.
+
+        Args:
+            identifier (str): The identifier to quote.
+
+        Returns:
+            str: The quoted identifier.
+        """
+        return '"' + identifier.replace('"', '""') + '"'
+
+    def columns(self, name):
+        """
+        Lists the columns of a registered table.
+
+        Args:
+            name (str): The name of the table.
+
+        Returns:
+            list: The column names.
+        """
+        return self.conn.view(name).columns
+
+    def register_source(self, name, source):
+        """
+        Registers a staged source under a table name without loading it into memory.
+
+        Args:
+            name (str): The table name to register the source as, e.g. "orders_table".
+            source (str or pandas.DataFrame): A CSV, JSON or Parquet file path (globs allowed), or a DataFrame.
+        """
+        version_name = f"{name}__v0"
+        if isinstance(source, str):
+            if ".parquet" in source:
+                reader = "read_parquet"
+            elif ".json" in source:
+                reader = "read_json_auto"
+            else:
+                reader = "read_csv_auto"
+            self.conn.execute(
+                f"CREATE OR REPLACE VIEW {self.quote(version_name)} AS "
+                f"SELECT * FROM {reader}('{source.replace(chr(39), chr(39) * 2)}')"
+            )
+        else:
+            self.conn.register(version_name, source)
+        self.versions[name] = 0
+        self.rejected_views[name] = []
+        self.conn.execute(
+            f"CREATE OR REPLACE VIEW {self.quote(name)} AS "
+            f"SELECT * FROM {self.quote(version_name)}"
+        )
+
+    def replace(self, name, query):
+        """
+        Replaces a table with the result of a query over its current version.
+
+        Args:
+            name (str): The name of the table.
+            query (str): The SELECT statement, with ``{source}`` standing for the current version.
+        """
+        source = self.quote(f"{name}__v{self.versions[name]}")
+        self.versions[name] += 1
+        version_name = self.quote(f"{name}__v{self.versions[name]}")
+        self.conn.execute(
+            f"CREATE OR REPLACE VIEW {version_name} AS {query.replace('{source}', source)}"
+        )
+        self.conn.execute(
+            f"CREATE OR REPLACE VIEW {self.quote(name)} AS SELECT * FROM {version_name}"
+        )
+
+    def drop_rows(self, name, conditions, exclude=()):
+        """
+        Drops rows matching any of the given conditions, keeping them with their reason codes.
+
+        Args:
+            name (str): The name of the table to drop rows from.
+            conditions (dict): A dictionary mapping each reason code to an SQL condition flagging the rows to drop.
+            exclude (list, optional): Helper columns to leave out of the kept rows.
+        """
+        flags = [f"COALESCE({condition}, false)" for condition in conditions.values()]
+        any_flag = " OR ".join(flags)
+        codes = ", ".join(
+            f"CASE WHEN {flag} THEN '{reason}' END"
+            for reason, flag in zip(conditions, flags)
+        )
+        source = self.quote(f"{name}__v{self.versions[name]}")
+        rejected_view = f"{name}__rejected{len(self.rejected_views[name])}"
+        self.conn.execute(
+            f"CREATE OR REPLACE VIEW {self.quote(rejected_view)} AS "
+            f"SELECT * {self.exclude(exclude)}, concat_ws(',', {codes}) AS reason_codes "
+            f"FROM {source} WHERE {any_flag}"
+        )
+        self.rejected_views[name].append(rejected_view)
+        self.replace(name, f"SELECT * FROM {{source}} WHERE NOT ({any_flag})")
+
+    def exclude(self, columns):
+        """
+        Builds the EXCLUDE clause leaving some columns out of a ``SELECT *``.
+
+        Args:
+            columns (list): The names of the columns to leave out.
+
+        Returns:
+            str: The EXCLUDE clause, or an empty string if there are no columns.
+        """
+        if not len(columns):
+            return ""
+        return f"EXCLUDE ({', '.join(self.quote(column) for column in columns)})"
+
+    def record_batches(self, name, rows_per_batch=100_000):
+        """
+        Runs the cleaning steps of a table and streams the result as Arrow record batches.
+
+        Args:
+            name (str): The name of the table.
+            rows_per_batch (int, optional): The number of rows per batch. Defaults to 100000.
+
+        Returns:
+            pyarrow.RecordBatchReader: A reader yielding the cleaned rows batch by batch.
+        """
+        return self.conn.execute(
+            f"SELECT * FROM {self.quote(name)}"
+        ).fetch_record_batch(rows_per_batch)
+
+    def rejected_batches(self, name, rows_per_batch=100_000):
+        """
+        Streams the rows dropped while cleaning a table as Arrow record batches.
+
+        Args:
+            name (str): The name of the table.
+            rows_per_batch (int, optional): The number of rows per batch. Defaults to 100000.
+
+        Returns:
+            pyarrow.RecordBatchReader: A reader yielding the dropped rows, with a "reason_codes" column, or None if no step dropped rows.
+        """
+        if not self.rejected_views[name]:
+            return None
+        query = " UNION ALL BY NAME ".join(
+            f"SELECT * FROM {self.quote(view)}" for view in self.rejected_views[name]
+        )
+        return self.conn.execute(query).fetch_record_batch(rows_per_batch)
+
+    def unknown_string(self, column):
+        """
+        Builds the SQL condition matching the unknown string pattern in a column.
+
+        Args:
+            column (str): The name of the column.
+
+        Returns:
+            str: The SQL condition.
+        """
+        return f"regexp_full_match(CAST({self.quote(column)} AS VARCHAR), '[A-Z0-9]{{10}}')"
+
+    def clean_unknown_string(self, name, required=()):
+        """
+        Removes values in the table where any column matches a specific regex pattern.
+
+        Rows with an unknown string in a required column are dropped first, with the reason code
+        UNKNOWN_STRING, so they are kept with their original values rather than as missing values.
+
+        Args:
+            name (str): The name of the table to be cleaned.
+            required (list, optional): The columns a row cannot be used without, e.g. ["address"].
+        """
+        if len(required):
+            self.drop_rows(
+                name,
+                {
+                    "UNKNOWN_STRING": " OR ".join(
+                        self.unknown_string(column) for column in required
+                    )
+                },
+            )
+        replacements = ", ".join(
+            f"CASE WHEN {self.unknown_string(column)} "
+            f"THEN NULL ELSE {self.quote(column)} END AS {self.quote(column)}"
+            for column in self.columns(name)
+        )
+        self.replace(name, f"SELECT {replacements} FROM {{source}}")
+
+    def clean_dates(self, name):
+        """
+        Converts string dates to timestamps and drops rows with invalid dates.
+
+        The known formats are tried first. Values none of them match fall back to DuckDB's own
+        timestamp parsing and then to FALLBACK_DATE_FORMATS, which cover the common day-first,
+        month-first and spelled-out dates pandas infers with ``format="mixed"``. Other layouts
+        pandas can still infer, such as dates with times in those formats, are dropped here.
+        Dropped rows keep the original, unparsed value.
+
+        Args:
+            name (str): The name of the table to be cleaned.
+        """
+        for column in self.columns(name):
+            if "date" not in column:
+                continue
+            quoted = self.quote(column)
+            parsed_column = f"{column}__parsed"
+            as_text = f"CAST({quoted} AS VARCHAR)"
+            parsed = ", ".join(
+                [
+                    f"try_strptime({as_text}, '{date_format}')"
+                    for date_format in DataCleaning.DATE_FORMATS
+                ]
+                + [f"TRY_CAST({as_text} AS TIMESTAMP)"]
+                + [
+                    f"try_strptime({as_text}, '{date_format}')"
+                    for date_format in self.FALLBACK_DATE_FORMATS
+                ]
+            )
+            self.replace(
+                name,
+                f"SELECT *, COALESCE({parsed}) AS {self.quote(parsed_column)} FROM {{source}}",
+            )
+            self.drop_rows(
+                name,
+                {f"INVALID_{column.upper()}": f"{self.quote(parsed_column)} IS NULL"},
+                exclude=[parsed_column],
+            )
+            self.replace(
+                name,
+                f"SELECT * EXCLUDE ({self.quote(parsed_column)}) "
+                f"REPLACE ({self.quote(parsed_column)} AS {quoted}) FROM {{source}}",
+            )
+
+    def clean_address(self, name):
+        """
+        Cleans and formats address data in the table.
+
+        Args:
+            name (str): The name of the table to be cleaned.
+        """
+        self.drop_rows(name, {"MISSING_ADDRESS": "address IS NULL"})
+        self.replace(
+            name,
+            "SELECT * REPLACE (replace(address, chr(10), ', ') AS address) FROM {source}",
+        )
+
+    def reset_index_col(self, name, index_col):
+        """
+        Removes the index column of the table; rows have no index outside pandas.
+
+        Args:
+            name (str): The name of the table.
+            index_col (str): The index column to remove.
+        """
+        if index_col is not None:
+            self.replace(
+                name, f"SELECT * EXCLUDE ({self.quote(index_col)}) FROM {{source}}"
+            )
+
+    def clean_user_data(self, name, index_col="index"):
+        """
+        Cleans user data by applying various cleaning functions.
+
+        Args:
+            name (str): The name of the table containing user data.
+            index_col (str): The index column to remove.
+        """
+        self.clean_dates(name)
+        self.clean_unknown_string(name, required=["address"])
+        self.clean_address(name)
+        self.reset_index_col(name, index_col=index_col)
+        self.replace(
+            name,
+            "SELECT * REPLACE (CASE WHEN country_code = 'GGB' THEN 'GB' "
+            "ELSE country_code END AS country_code) FROM {source}",
+        )
+
+    def clean_card_data(self, name):
+        """
+        Cleans credit card data by removing NULL values and applying string cleaning.
+
+        Args:
+            name (str): The name of the table containing card data.
+        """
+        columns = [self.quote(column) for column in self.columns(name)]
+        self.drop_rows(
+            name,
+            {
+                "MISSING_VALUE": " OR ".join(f"{column} IS NULL" for column in columns),
+                "UNKNOWN_STRING": " OR ".join(
+                    self.unknown_string(column) for column in self.columns(name)
+                ),
+                "HEADER_ROW": " OR ".join(
+                    f"CAST({column} AS VARCHAR) = '{raw}'"
+                    for column, raw in zip(columns, self.columns(name))
+                ),
+            },
+        )
+        self.replace(
+            name,
+            "SELECT * REPLACE (regexp_replace(CAST(card_number AS VARCHAR), '\\?+', '', 'g') "
+            "AS card_number) FROM {source}",
+        )
+
+    def clean_store_data(self, name, index_col="index"):
+        """
+        Cleans store data, adjusting fields specific to different types of stores.
+
+        Args:
+            name (str): The name of the table containing store data.
+            index_col (str): The index column to remove.
+        """
+        self.clean_unknown_string(name, required=["address"])
+        self.clean_address(name)
+        self.clean_dates(name)
+        web_portal = "store_type = 'Web Portal'"
+        self.replace(
+            name,
+            f"""
+            SELECT * REPLACE (
+                CASE WHEN {web_portal} THEN 'N/A' ELSE address END AS address,
+                CASE WHEN {web_portal} THEN NULL ELSE longitude END AS longitude,
+                CASE WHEN {web_portal} THEN NULL ELSE latitude END AS latitude,
+                regexp_replace(CAST(staff_numbers AS VARCHAR), '[A-Za-z]+', '', 'g') AS staff_numbers,
+                CASE WHEN {web_portal} THEN 'N/A'
+                     ELSE regexp_replace(continent, '^[a-z]+', '') END AS continent
+            )
+            FROM {{source}}
+            """,
+        )
+        self.reset_index_col(name, index_col=index_col)
+
+    def convert_product_weights(self, name):
+        """
+        Converts product weight to a uniform unit of measurement.
+
+        Args:
+            name (str): The name of the table containing product weight data.
+        """
+        self.drop_rows(name, {"MISSING_WEIGHT": "weight IS NULL"})
+        self.replace(
+            name,
+            """
+            WITH parsed AS (
+                SELECT
+                    *,
+                    regexp_extract(replace(replace(weight, ' ', ''), 'x', '*'),
+                                   '([a-zA-Z]+)', 1) AS weight_unit,
+                    regexp_extract(replace(replace(weight, ' ', ''), 'x', '*'),
+                                   '([0-9]+\\.[0-9]+|[0-9]+\\*[0-9]+|[0-9]+)', 1) AS weight_value
+                FROM {source}
+            )
+            SELECT * EXCLUDE (weight_unit, weight_value) REPLACE (
+                CASE weight_unit
+                    WHEN 'g' THEN 0.001 WHEN 'ml' THEN 0.001
+                    WHEN 'oz' THEN 0.028349523125 WHEN 'kg' THEN 1
+                END
+                * CASE
+                    WHEN weight_value LIKE '%*%'
+                    THEN CAST(split_part(weight_value, '*', 1) AS DOUBLE)
+                         * CAST(split_part(weight_value, '*', 2) AS DOUBLE)
+                    ELSE TRY_CAST(weight_value AS DOUBLE)
+                END AS weight
+            )
+            FROM parsed
+            """,
+        )
+
+    def clean_products_data(self, name):
+        """
+        Cleans products data, including categories, pricing and weight classes.
+
+        Args:
+            name (str): The name of the table containing products data.
+        """
+        self.clean_dates(name)
+        bins = DataCleaning.WEIGHT_CLASS_BINS[1:-1]
+        weight_class = " ".join(
+            f"WHEN weight < {upper} THEN '{label}'"
+            for upper, label in zip(bins, DataCleaning.WEIGHT_CLASSES)
+        )
+        self.replace(
+            name,
+            """
+            SELECT * EXCLUDE (removed) REPLACE (
+                CAST(round(weight, 3) AS FLOAT) AS weight,
+                CAST(replace(product_price, '£', '') AS FLOAT) AS product_price
+            ),
+            COALESCE(removed, '') <> 'Removed' AS still_available
+            FROM {source}
+            """,
+        )
+        self.replace(
+            name,
+            f"""
+            SELECT *, CASE {weight_class}
+                           WHEN weight IS NOT NULL THEN '{DataCleaning.WEIGHT_CLASSES[-1]}'
+                      END AS weight_class
+            FROM {{source}}
+            """,
+        )
+
+    def clean_orders_data(self, name):
+        """
+        Cleans orders data by dropping unnecessary columns.
+
+        Args:
+            name (str): The name of the table containing orders data.
+        """
+        self.replace(
+            name,
+            'SELECT * EXCLUDE (first_name, last_name, "1", level_0) FROM {source}',
+        )
+
+    def clean_date_data(self, name):
+        """
+        Cleans and standardizes date and time data in the table.
+
+        Each sale also gets the number of seconds until the next sale of the same year.
+
+        Args:
+            name (str): The name of the table containing date and time data.
+        """
+        self.clean_unknown_string(name, required=self.columns(name))
+        columns = self.columns(name)
+        self.replace(
+            name,
+            "SELECT "
+            + ", ".join(
+                f"NULLIF(CAST({self.quote(column)} AS VARCHAR), 'NULL') AS {self.quote(column)}"
+                for column in columns
+            )
+            + " FROM {source}",
+        )
+        self.drop_rows(
+            name,
+            {
+                "MISSING_VALUE": " OR ".join(
+                    f"{self.quote(column)} IS NULL" for column in columns
+                )
+            },
+        )
+        self.replace(
+            name,
+            """
+            SELECT
+                * EXCLUDE (timestamp),
+                strptime(year || '-' || month || '-' || day || ' ' || timestamp,
+                         '%Y-%m-%d %H:%M:%S') AS datetime
+            FROM {source}
+            """,
+        )
+        self.replace(
+            name,
+            """
+            SELECT
+                *,
+                date_diff('microsecond', datetime,
+                          lead(datetime) OVER (PARTITION BY year ORDER BY datetime)
+                ) / 1e6 AS seconds_to_next_sale
+            FROM {source}
+            """,
+        )
@@ -1,22 +1,47 @@
+import asyncio
+import json
+import os
 import re
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from io import BytesIO, StringIO
 
-import boto3
 import pandas as pd
-import requests
-import tabula
-from IPython.display import display
+from sqlalchemy import Integer, MetaData, Table, func, select
 
 
 def list_buckets():
     """
     Lists all the buckets in the connected AWS S3 resource.
     """
+    import boto3
+
     s3 = boto3.resource("s3")
     for bucket in s3.buckets.all():
         print(bucket.name)
 
 
+def run_sync(coroutine):
+    """
+    Runs a coroutine to completion from synchronous code.
+
+    When an event loop is already running in this thread (e.g. in a Jupyter kernel),
+    the coroutine is run on a fresh event loop in a worker thread instead.
+
+    Args:
+        coroutine (coroutine): The coroutine to run.
+
+    Returns:
+        The value returned by the coroutine.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coroutine).result()
+
+
 class DataExtractor:
     """
     This class provides methods for extracting data from various sources including RDS, PDFs, APIs, and S3.
@@ -49,61 +74,196 @@ class DataExtractor:
             return rds_table
 
     @staticmethod
-    def retrieve_pdf_data(url):
+    def read_rds_tables(
+        instance,
+        tables,
+        creds_yaml,
+        chunk_size=100000,
+        max_workers=8,
+        checkpoint_dir=".extract_checkpoints",
+    ):
+        """
+        Reads several tables from a relational database (RDS) concurrently over one pooled engine.
+
+        Tables with an integer primary key (or an integer "index" column) are split into key ranges
+        of ``chunk_size`` which are read in parallel. Each completed range is checkpointed to
+        ``checkpoint_dir``, so an interrupted extract resumes from the ranges still missing.
+        A table's checkpoints are removed once it has been read in full.
+
+        Args:
+            instance (DatabaseConnector): An instance of the DatabaseConnector class used to connect to the database.
+            tables (list): The names of the tables to read from the database.
+            creds_yaml (str): The path to the YAML file containing the database credentials.
+            chunk_size (int, optional): The number of key values per range. Defaults to 100000.
+            max_workers (int, optional): The number of ranges read at once. Defaults to 8.
+            checkpoint_dir (str, optional): The directory where completed ranges are stored.
+
+        Returns:
+            dict: A dictionary mapping each table name to its data as a pandas DataFrame.
+        """
+        creds = instance.read_db_creds(creds_yaml)
+        engine = instance.init_db_engine(creds, pool_size=max_workers, max_overflow=0)
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = {}
+                for table in tables:
+                    table_dir = os.path.join(checkpoint_dir, table)
+                    os.makedirs(table_dir, exist_ok=True)
+                    rds_table, key, ranges = DataExtractor._plan_table_ranges(
+                        engine, table, chunk_size
+                    )
+                    futures[table] = [
+                        executor.submit(
+                            DataExtractor._read_table_range,
+                            engine,
+                            rds_table,
+                            key,
+                            key_range,
+                            table_dir,
+                        )
+                        for key_range in ranges
+                    ]
+                rds_tables = {}
+                for table, table_futures in futures.items():
+                    chunks = [future.result() for future in table_futures]
+                    rds_tables[table] = pd.concat(chunks, ignore_index=True)
+                    for file_name in os.listdir(os.path.join(checkpoint_dir, table)):
+                        os.remove(os.path.join(checkpoint_dir, table, file_name))
+                    print(f"{table}: read {len(rds_tables[table])} rows.")
+        finally:
+            engine.dispose()
+        return rds_tables
+
+    @staticmethod
+    def _plan_table_ranges(engine, table, chunk_size):
+        """
+        Splits a table into key ranges that can be read independently.
+
+        Args:
+            engine (sqlalchemy.engine.base.Engine): The engine connected to the database.
+            table (str): The name of the table to split.
+            chunk_size (int): The number of key values per range.
+
+        Returns:
+            tuple: The reflected table, the key column (or None) and a list of (start, stop) ranges.
+                A nullable key gets an extra (None, None) range for the rows without a key value.
+        """
+        rds_table = Table(table, MetaData(), autoload_with=engine)
+        candidates = [column for column in rds_table.primary_key.columns]
+        if "index" in rds_table.c:
+            candidates.append(rds_table.c["index"])
+        key = next(
+            (column for column in candidates if isinstance(column.type, Integer)), None
+        )
+        if key is None:
+            return rds_table, None, [None]
+        with engine.connect() as conn:
+            low, high = conn.execute(select(func.min(key), func.max(key))).one()
+        if low is None:
+            return rds_table, None, [None]
+        ranges = [
+            (start, min(start + chunk_size, high + 1))
+            for start in range(low, high + 1, chunk_size)
+        ]
+        if key.nullable:
+            ranges.append((None, None))
+        return rds_table, key, ranges
+
+    @staticmethod
+    def _read_table_range(engine, rds_table, key, key_range, table_dir):
+        """
+        Reads one key range of a table, reusing its checkpoint if the range was already read.
+
+        Args:
+            engine (sqlalchemy.engine.base.Engine): The engine connected to the database.
+            rds_table (sqlalchemy.Table): The reflected table to read from.
+            key (sqlalchemy.Column): The key column the range applies to, or None to read the whole table.
+            key_range (tuple): The (start, stop) key range to read, (None, None) to read the rows without a key,
+                or None to read the whole table.
+            table_dir (str): The directory where the table's completed ranges are stored.
+
+        Returns:
+            pandas.DataFrame: The rows of the range as a DataFrame.
+        """
+        if key_range is None:
+            checkpoint = os.path.join(table_dir, "full.pkl")
+            query = select(rds_table)
+        elif key_range == (None, None):
+            checkpoint = os.path.join(table_dir, "null.pkl")
+            query = select(rds_table).where(key.is_(None))
+        else:
+            checkpoint = os.path.join(table_dir, f"{key_range[0]}-{key_range[1]}.pkl")
+            query = (
+                select(rds_table)
+                .where(key >= key_range[0], key < key_range[1])
+                .order_by(key)
+            )
+        if os.path.exists(checkpoint):
+            return pd.read_pickle(checkpoint)
+        with engine.connect() as conn:
+            chunk = pd.read_sql(query, conn)
+        chunk.to_pickle(f"{checkpoint}.tmp")
+        os.replace(f"{checkpoint}.tmp", checkpoint)
+        return chunk
+
+    @staticmethod
+    def retrieve_pdf_data(url, cache=None):
         """
         Retrieves data from a PDF file located at the given URL.
 
         Args:
             url (str): The URL of the PDF file.
+            cache (ResponseCache, optional): A cache the PDF is downloaded through, so an unchanged PDF is not downloaded again.
 
         Returns:
             pandas.DataFrame: The data extracted from the PDF as a DataFrame.
         """
+        import tabula
+
+        if cache is not None:
+            url = BytesIO(run_sync(AsyncDataExtractor.fetch(url, {}, cache=cache)))
         df = tabula.read_pdf(url, "dataframe", pages="all", multiple_tables=False)
         return df[0]
 
     @staticmethod
-    def list_number_of_stores(url, headers):
+    def list_number_of_stores(url, headers, cache=None):
         """
         Retrieves the number of stores from an API endpoint.
 
+        This is a synchronous wrapper around AsyncDataExtractor.list_number_of_stores.
+
         Args:
             url (str): The URL of the API endpoint to get the number of stores.
             headers (dict): The headers to be used in the API request.
+            cache (ResponseCache, optional): A cache the response is fetched through.
 
         Returns:
             int: The number of stores.
         """
-        response = requests.get(url, headers=headers, timeout=60)
-        if response.status_code == 200:
-            data = response.json()
-            number_of_stores = data["number_stores"]
-            print(f"Number of stores: {data['number_stores']}")
-        return number_of_stores
+        return run_sync(
+            AsyncDataExtractor.list_number_of_stores(url, headers, cache=cache)
+        )
 
     @staticmethod
-    def retrieve_stores_data(url, headers, number_of_stores):
+    def retrieve_stores_data(url, headers, number_of_stores, cache=None):
         """
         Retrieves data for each store from an API endpoint and compiles it into a DataFrame.
 
+        This is a synchronous wrapper around AsyncDataExtractor.retrieve_stores_data.
+
         Args:
             url (str): The URL of the API endpoint to get store details. The URL should have a placeholder for the store number.
             headers (dict): The headers to be used in the API request.
+            cache (ResponseCache, optional): A cache the responses are fetched through.
 
         Returns:
             pandas.DataFrame: The compiled store data as a DataFrame.
         """
-        store_json_list = []
-        for store_num in range(number_of_stores):
-            response = requests.get(
-                url.format(store_number=store_num), headers=headers, timeout=60
+        return run_sync(
+            AsyncDataExtractor.retrieve_stores_data(
+                url, headers, number_of_stores, cache=cache
             )
-            if response.status_code == 200:
-                data = response.json()
-            store_json = data
-            store_json_list.append(store_json)
-        store_df = pd.json_normalize(store_json_list)
-        return store_df
+        )
 
     @staticmethod
     def extract_from_s3(url):
@@ -116,6 +276,8 @@ class DataExtractor:
         Returns:
             pandas.DataFrame: The data extracted from the file as a DataFrame.
         """
+        import boto3
+
         match = re.match(
             r"(s3|http|https)://(?P<bucket>[-a-zA-Z]+)\.?[a-zA-Z0-9.-]*/(?P<path>.+)",
             url,
@@ -151,5 +313,188 @@ class DataExtractor:
             df (pandas.DataFrame): The DataFrame to be printed.
             head (int, optional): The number of rows to print. Defaults to 100000.
         """
+        from IPython.display import display
+
         with pd.option_context("display.max_rows", None, "display.max_columns", None):
             display(df.head(head))
+
+
+class AsyncDataExtractor:
+    """
+    This class provides asyncio-native counterparts of the DataExtractor methods, so that a single
+    event loop can overlap the network I/O of every source.
+
+    HTTP requests are made with aiohttp. The RDS, S3 and PDF readers have no async client in
+    this project's stack, so they run the blocking DataExtractor methods in worker threads.
+    """
+
+    @staticmethod
+    @asynccontextmanager
+    async def _client_session(session):
+        """
+        Yields the given aiohttp session, or a new one that is closed on exit.
+
+        Args:
+            session (aiohttp.ClientSession): An existing session, or None.
+        """
+        if session is not None:
+            yield session
+            return
+        import aiohttp
+
+        timeout = aiohttp.ClientTimeout(total=60)
+        async with aiohttp.ClientSession(timeout=timeout) as new_session:
+            yield new_session
+
+    @staticmethod
+    async def fetch(url, headers, cache=None, session=None):
+        """
+        Downloads the body of a URL, going through the response cache if one is given.
+
+        A fresh cached response is returned without contacting the server. A stale one is revalidated
+        with a conditional request and reused if the server answers 304 Not Modified.
+
+        Args:
+            url (str): The URL to download.
+            headers (dict): The headers to be used in the request.
+            cache (ResponseCache, optional): The cache to serve and store the response in.
+            session (aiohttp.ClientSession, optional): The session to send the request on.
+
+        Returns:
+            bytes: The response body.
+        """
+        entry = None
+        if cache is not None:
+            key = cache.cache_key(url, headers)
+            entry = cache.get(key)
+            if entry is not None and cache.is_fresh(entry):
+                cache.stats["fresh"] += 1
+                return entry["body"]
+            headers = {**headers, **cache.conditional_headers(entry)}
+        async with AsyncDataExtractor._client_session(session) as client:
+            async with client.get(url, headers=headers) as response:
+                if response.status == 304 and entry is not None:
+                    cache.refresh(key, response.headers)
+                    cache.stats["revalidated"] += 1
+                    return entry["body"]
+                response.raise_for_status()
+                body = await response.read()
+        if cache is not None:
+            cache.store(key, url, body, response.headers)
+            cache.stats["downloaded"] += 1
+        return body
+
+    @staticmethod
+    async def list_number_of_stores(url, headers, session=None, cache=None):
+        """
+        Retrieves the number of stores from an API endpoint.
+
+        Args:
+            url (str): The URL of the API endpoint to get the number of stores.
+            headers (dict): The headers to be used in the API request.
+            session (aiohttp.ClientSession, optional): The session to send the request on.
+            cache (ResponseCache, optional): A cache the response is fetched through.
+
+        Returns:
+            int: The number of stores.
+        """
+        body = await AsyncDataExtractor.fetch(
+            url, headers, cache=cache, session=session
+        )
+        data = json.loads(body)
+        number_of_stores = data["number_stores"]
+        print(f"Number of stores: {number_of_stores}")
+        return number_of_stores
+
+    @staticmethod
+    async def retrieve_stores_data(
+        url, headers, number_of_stores, max_concurrency=20, session=None, cache=None
+    ):
+        """
+        Retrieves data for each store from an API endpoint concurrently and compiles it into a DataFrame.
+
+        Args:
+            url (str): The URL of the API endpoint to get store details. The URL should have a placeholder for the store number.
+            headers (dict): The headers to be used in the API request.
+            number_of_stores (int): The number of stores to retrieve.
+            max_concurrency (int, optional): The maximum number of requests in flight. Defaults to 20.
+            session (aiohttp.ClientSession, optional): The session to send the requests on.
+            cache (ResponseCache, optional): A cache the responses are fetched through, so only
+                stores whose cached record has expired or changed are downloaded again.
+
+        Returns:
+            pandas.DataFrame: The compiled store data as a DataFrame.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def retrieve_store(client, store_num):
+            async with semaphore:
+                body = await AsyncDataExtractor.fetch(
+                    url.format(store_number=store_num),
+                    headers,
+                    cache=cache,
+                    session=client,
+                )
+                return json.loads(body)
+
+        stats_before = cache.stats.copy() if cache is not None else None
+        async with AsyncDataExtractor._client_session(session) as client:
+            store_json_list = await asyncio.gather(
+                *(
+                    retrieve_store(client, store_num)
+                    for store_num in range(number_of_stores)
+                )
+            )
+        if cache is not None:
+            stats = cache.stats - stats_before
+            print(
+                f"Store details: {stats['fresh']} from cache, "
+                f"{stats['revalidated']} revalidated, "
+                f"{stats['downloaded']} downloaded."
+            )
+        store_df = pd.json_normalize(store_json_list)
+        return store_df
+
+    @staticmethod
+    async def read_rds_table(instance, table, creds_yaml):
+        """
+        Reads a table from a relational database (RDS) in a worker thread.
+
+        Args:
+            instance (DatabaseConnector): An instance of the DatabaseConnector class used to connect to the database.
+            table (str): The name of the table to read from the database.
+            creds_yaml (str): The path to the YAML file containing the database credentials.
+
+        Returns:
+            pandas.DataFrame: The table data as a pandas DataFrame.
+        """
+        return await asyncio.to_thread(
+            DataExtractor.read_rds_table, instance, table, creds_yaml
+        )
+
+    @staticmethod
+    async def extract_from_s3(url):
+        """
+        Extracts data from a file stored in an S3 bucket in a worker thread.
+
+        Args:
+            url (str): The S3 URL of the file to be extracted.
+
+        Returns:
+            pandas.DataFrame: The data extracted from the file as a DataFrame.
+        """
+        return await asyncio.to_thread(DataExtractor.extract_from_s3, url)
+
+    @staticmethod
+    async def retrieve_pdf_data(url, cache=None):
+        """
+        Retrieves data from a PDF file located at the given URL in a worker thread.
+
+        Args:
+            url (str): The URL of the PDF file.
+            cache (ResponseCache, optional): A cache the PDF is downloaded through.
+
+        Returns:
+            pandas.DataFrame: The data extracted from the PDF as a DataFrame.
+        """
+        return await asyncio.to_thread(DataExtractor.retrieve_pdf_data, url, cache)
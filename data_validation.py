@@ -0,0 +1,216 @@
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy import column, select, table
+
+UUID_PATTERN = (
+    r"^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$"
+)
+COUNTRY_CODES = ["GB", "DE", "US"]
+
+VALIDATION_RULES = {
+    "dim_users_table": [
+        {"reason": "INVALID_USER_UUID", "column": "user_uuid", "pattern": UUID_PATTERN},
+        {
+            "reason": "INVALID_COUNTRY_CODE",
+            "column": "country_code",
+            "domain": COUNTRY_CODES,
+        },
+    ],
+    "dim_card_details": [
+        {
+            "reason": "INVALID_CARD_NUMBER_LENGTH",
+            "column": "card_number",
+            "length": (9, 19),
+        },
+    ],
+    "dim_store_details": [
+        {
+            "reason": "INVALID_COUNTRY_CODE",
+            "column": "country_code",
+            "domain": COUNTRY_CODES,
+        },
+    ],
+    "dim_products": [
+        {"reason": "INVALID_UUID", "column": "uuid", "pattern": UUID_PATTERN},
+    ],
+    "dim_date_times": [
+        {"reason": "INVALID_DATE_UUID", "column": "date_uuid", "pattern": UUID_PATTERN},
+    ],
+    "orders_table": [
+        {"reason": "INVALID_DATE_UUID", "column": "date_uuid", "pattern": UUID_PATTERN},
+        {"reason": "INVALID_USER_UUID", "column": "user_uuid", "pattern": UUID_PATTERN},
+        {
+            "reason": "UNKNOWN_CARD_NUMBER",
+            "column": "card_number",
+            "references": ("dim_card_details", "card_number"),
+        },
+        {
+            "reason": "UNKNOWN_DATE_UUID",
+            "column": "date_uuid",
+            "references": ("dim_date_times", "date_uuid"),
+        },
+        {
+            "reason": "UNKNOWN_PRODUCT_CODE",
+            "column": "product_code",
+            "references": ("dim_products", "product_code"),
+        },
+        {
+            "reason": "UNKNOWN_STORE_CODE",
+            "column": "store_code",
+            "references": ("dim_store_details", "store_code"),
+        },
+        {
+            "reason": "UNKNOWN_USER_UUID",
+            "column": "user_uuid",
+            "references": ("dim_users_table", "user_uuid"),
+        },
+    ],
+}
+
+
+def reason_codes(masks):
+    """
+    Combines named boolean masks into one reason code string per rejected row.
+
+    Args:
+        masks (dict): A dictionary mapping each reason code to a boolean Series flagging the rows it rejects.
+
+    Returns:
+        pandas.Series: The comma-separated reason codes, indexed by the rejected rows only.
+    """
+    flags = pd.DataFrame(masks)
+    flags = flags[flags.any(axis=1)]
+    codes = pd.Series("", index=flags.index, dtype=object)
+    for reason in flags.columns:
+        codes = codes.where(~flags[reason], codes + f"{reason},")
+    return codes.str.rstrip(",")
+
+
+class DataValidator:
+    """
+    This class provides a vectorised rule engine that checks DataFrames against declarative constraints
+    and sends the rejected rows to a quarantine table with their reason codes.
+
+    A rule is a dictionary with a "reason" code, the "column" it checks and exactly one constraint:
+    "pattern" (regex the whole value must match), "length" (inclusive (min, max) string length),
+    "domain" (list of allowed values) or "references" (a (table, column) pair the value must exist in).
+    Null values fail every constraint.
+    """
+
+    def __init__(self, connector=None):
+        """
+        Initializes an instance of the DataValidator class.
+
+        Args:
+            connector (DatabaseConnector, optional): A connector with an initialised engine, used to look up
+                "references" rules and to write the quarantine table.
+        """
+        self.connector = connector
+        self.reference_cache = {}
+
+    def reference_values(self, ref_table, ref_column):
+        """
+        Reads the distinct values of a column once and caches them as strings.
+
+        Args:
+            ref_table (str): The name of the referenced table.
+            ref_column (str): The name of the referenced column.
+
+        Returns:
+            pandas.Index: The distinct values of the column.
+        """
+        key = (ref_table, ref_column)
+        if key not in self.reference_cache:
+            query = select(column(ref_column)).distinct().select_from(table(ref_table))
+            with self.connector.engine.connect() as conn:
+                values = [str(row[0]) for row in conn.execute(query)]
+            self.reference_cache[key] = pd.Index(values)
+        return self.reference_cache[key]
+
+    def rule_mask(self, df, rule):
+        """
+        Evaluates one rule against a DataFrame.
+
+        Args:
+            df (pandas.DataFrame): The DataFrame to check.
+            rule (dict): The rule to evaluate.
+
+        Returns:
+            pandas.Series: A boolean Series that is True for the rows failing the rule.
+        """
+        values = df[rule["column"]]
+        as_text = values.astype(str)
+        if "pattern" in rule:
+            passed = as_text.str.fullmatch(rule["pattern"])
+        elif "length" in rule:
+            min_length, max_length = rule["length"]
+            passed = as_text.str.len().between(min_length, max_length)
+        elif "domain" in rule:
+            passed = values.isin(rule["domain"])
+        elif "references" in rule:
+            passed = as_text.isin(self.reference_values(*rule["references"]))
+        else:
+            raise ValueError(f"Rule {rule['reason']} has no constraint.")
+        return values.isna() | ~passed
+
+    def validate(self, df, rules, chunksize=None):
+        """
+        Splits a DataFrame into the rows passing every rule and the rejected rows.
+
+        All rules are evaluated over each chunk in a single pass and the reason codes of every failed
+        rule are recorded, so a row failing several checks is reported once with all of its reasons.
+
+        Args:
+            df (pandas.DataFrame): The DataFrame to validate.
+            rules (list): The rules to evaluate, e.g. VALIDATION_RULES["orders_table"].
+            chunksize (int, optional): The number of rows evaluated at a time. Defaults to the whole DataFrame.
+
+        Returns:
+            tuple: The valid rows and the rejected rows (with a "reason_codes" column) as DataFrames.
+        """
+        if not rules or df.empty:
+            return df, df.iloc[0:0].assign(reason_codes=pd.Series(dtype=object))
+        chunksize = chunksize or len(df)
+        valid_chunks, rejected_chunks = [], []
+        for start in range(0, len(df), chunksize):
+            chunk = df.iloc[start : start + chunksize]
+            masks = {}
+            for rule in rules:
+                mask = self.rule_mask(chunk, rule)
+                masks[rule["reason"]] = masks.get(rule["reason"], False) | mask
+            codes = reason_codes(masks)
+            rejected = chunk.index.isin(codes.index)
+            valid_chunks.append(chunk[~rejected])
+            rejected_chunks.append(chunk[rejected].assign(reason_codes=codes))
+        valid_df = pd.concat(valid_chunks)
+        rejected_df = pd.concat(rejected_chunks)
+        print(f"Validation rejected {len(rejected_df)} of {len(df)} rows.")
+        return valid_df, rejected_df
+
+    def quarantine(self, rejected_df, source_table, quarantine_table="quarantine_rows"):
+        """
+        Appends rejected rows to the quarantine table.
+
+        The rejected rows are stored as JSON alongside their source table, reason codes and
+        rejection time, so rows from tables with different schemas share one quarantine table.
+
+        Args:
+            rejected_df (pandas.DataFrame): The rejected rows, with a "reason_codes" column.
+            source_table (str): The name of the table the rows were meant for.
+            quarantine_table (str, optional): The name of the quarantine table. Defaults to "quarantine_rows".
+        """
+        if rejected_df.empty:
+            return
+        row_data = rejected_df.drop(columns=["reason_codes"]).to_json(
+            orient="records", lines=True, date_format="iso", default_handler=str
+        )
+        quarantine_df = pd.DataFrame(
+            {
+                "source_table": source_table,
+                "reason_codes": rejected_df["reason_codes"].to_numpy(),
+                "row_data": row_data.splitlines(),
+                "rejected_at": datetime.now(),
+            }
+        )
+        self.connector.upload_to_db(quarantine_df, quarantine_table, if_exists="append")
@@ -1,5 +1,84 @@
+import csv
+import time
+from io import StringIO
+
+import pandas as pd
 import yaml
-from sqlalchemy import create_engine, inspect
+from sqlalchemy import URL, Date, column, create_engine, inspect, select, table, text
+
+CONNECTION_PROFILES = {
+    "bulk-load": {
+        "settings": {
+            "work_mem": "256MB",
+            "maintenance_work_mem": "1GB",
+            "synchronous_commit": "off",
+            "statement_timeout": "0",
+        },
+        "engine": {
+            "executemany_mode": "values_plus_batch",
+            "insertmanyvalues_page_size": 10000,
+            "pool_size": 2,
+            "max_overflow": 0,
+        },
+    },
+    "analytics": {
+        "settings": {
+            "work_mem": "128MB",
+            "statement_timeout": "30min",
+            "jit": "on",
+        },
+        "engine": {
+            "pool_size": 4,
+            "max_overflow": 0,
+            "pool_pre_ping": True,
+        },
+    },
+    "interactive": {
+        "settings": {
+            "work_mem": "16MB",
+            "statement_timeout": "30s",
+            "idle_in_transaction_session_timeout": "60s",
+        },
+        "engine": {
+            "pool_size": 5,
+            "max_overflow": 10,
+            "pool_pre_ping": True,
+            "pool_recycle": 1800,
+        },
+    },
+}
+
+COPY_NULL = r"\N"
+
+
+def copy_insert(table, conn, keys, data_iter):
+    """
+    Inserts rows with PostgreSQL COPY, for use as the ``method`` of ``DataFrame.to_sql``.
+
+    Missing values are written as ``COPY_NULL``, so empty strings stay empty strings instead of
+    being read back as NULL.
+
+    Args:
+        table (pandas.io.sql.SQLTable): The table being written to.
+        conn (sqlalchemy.engine.Connection): The connection to write with.
+        keys (list): The column names.
+        data_iter (iterable): The rows to insert.
+    """
+    buffer = StringIO()
+    csv.writer(buffer).writerows(
+        [COPY_NULL if value is None else value for value in row] for row in data_iter
+    )
+    buffer.seek(0)
+    preparer = conn.dialect.identifier_preparer
+    table_name = preparer.quote(table.name)
+    if table.schema:
+        table_name = f"{preparer.quote_schema(table.schema)}.{table_name}"
+    columns = ", ".join(preparer.quote(key) for key in keys)
+    with conn.connection.cursor() as cur:
+        cur.copy_expert(
+            f"COPY {table_name} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')",
+            buffer,
+        )
 
 
 class DatabaseConnector:
@@ -27,12 +106,41 @@ class DatabaseConnector:
             data_loaded = yaml.safe_load(f)
         return data_loaded
 
-    def init_db_engine(self, creds):
+    def connection_profile(self, creds, profile):
+        """
+        Resolves a named connection profile, merging the PROFILES section of the credentials over the defaults.
+
+        Args:
+            creds (dict): A dictionary containing database credentials, optionally with a "PROFILES" section.
+            profile (str): The name of the profile, e.g. "bulk-load", "analytics" or "interactive".
+
+        Returns:
+            dict: The session "settings" and the "engine" keyword arguments of the profile.
+        """
+        overrides = (creds.get("PROFILES") or {}).get(profile, {})
+        if profile not in CONNECTION_PROFILES and not overrides:
+            raise ValueError(
+                f"Unknown connection profile {profile}. "
+                f"Available profiles: {', '.join(CONNECTION_PROFILES)}"
+            )
+        defaults = CONNECTION_PROFILES.get(profile, {})
+        return {
+            section: {**defaults.get(section, {}), **overrides.get(section, {})}
+            for section in ("settings", "engine")
+        }
+
+    def init_db_engine(self, creds, profile=None, **engine_kwargs):
         """
         Initializes a database engine using credentials.
 
+        With a connection profile, every connection of the engine applies the profile's session
+        settings (e.g. ``work_mem``, ``synchronous_commit``, ``statement_timeout``), and the engine
+        uses the profile's executemany mode and pool settings.
+
         Args:
             creds (dict): A dictionary containing database credentials.
+            profile (str, optional): The name of a connection profile, e.g. "bulk-load". Defaults to no session tuning.
+            **engine_kwargs: Extra keyword arguments passed to ``create_engine``, e.g. ``pool_size``.
 
         Returns:
             sqlalchemy.engine.base.Engine: A SQLAlchemy engine instance.
@@ -43,9 +151,27 @@ class DatabaseConnector:
         USER = creds["RDS_USER"]
         PASSWORD = creds["RDS_PASSWORD"]
         DATABASE = creds["RDS_DATABASE"]
-        PORT = 5432
+        PORT = int(creds.get("RDS_PORT") or 5432)
+        if profile is not None:
+            resolved = self.connection_profile(creds, profile)
+            options = " ".join(
+                f"-c {name}={value}" for name, value in resolved["settings"].items()
+            )
+            engine_kwargs = {
+                **resolved["engine"],
+                "connect_args": {"options": options},
+                **engine_kwargs,
+            }
         self.engine = create_engine(
-            f"{DATABASE_TYPE}+{DBAPI}://{USER}:{PASSWORD}@{HOST}:{PORT}/{DATABASE}"
+            URL.create(
+                f"{DATABASE_TYPE}+{DBAPI}",
+                username=USER,
+                password=PASSWORD,
+                host=HOST,
+                port=PORT,
+                database=DATABASE,
+            ),
+            **engine_kwargs,
         )
         return self.engine
 
@@ -60,20 +186,829 @@ class DatabaseConnector:
             inspector = inspect(conn)
             return inspector.get_table_names()
 
-    def upload_to_db(self, df, table_name):
+    def read_key_lookup(self, table_name, natural_key, surrogate_key):
+        """
+        Reads the natural key to surrogate key mapping of a dimension table.
+
+        Args:
+            table_name (str): The name of the dimension table.
+            natural_key (str): The natural key column.
+            surrogate_key (str): The surrogate key column.
+
+        Returns:
+            dict: The mapping, or an empty dictionary if the table or surrogate key column does not exist.
+        """
+        with self.engine.connect() as conn:
+            inspector = inspect(conn)
+            if not inspector.has_table(table_name):
+                return {}
+            columns = [column["name"] for column in inspector.get_columns(table_name)]
+            if surrogate_key not in columns:
+                return {}
+            query = select(column(natural_key), column(surrogate_key)).select_from(
+                table(table_name)
+            )
+            return {str(natural): key for natural, key in conn.execute(query)}
+
+    def compare_foreign_keys(self, table_name, references, repeat=3):
+        """
+        Measures the foreign keys of a fact table as surrogate keys against the natural keys they replaced.
+
+        The natural keys are projected back from the dimension tables, in their SQL types, into a temporary
+        table holding the other columns of the fact table too, as it was before the rewrite. Both tables
+        are analyzed first, so the planner has statistics for each. The size of both tables and of both
+        sets of key columns is measured, and a query joining the fact table to every dimension table is
+        timed on each set of keys.
+
+        Args:
+            table_name (str): The name of the fact table.
+            references (list): A (dimension table, natural key, surrogate key) tuple for each foreign key.
+            repeat (int, optional): The number of times each join is run; the fastest run is kept. Defaults to 3.
+
+        Returns:
+            dict: The "surrogate_table_bytes" and "natural_table_bytes" of the whole table, the
+                "surrogate_bytes" and "natural_bytes" of the key columns, and the
+                "surrogate_join_seconds" and "natural_join_seconds" of the joins.
+        """
+        preparer = self.engine.dialect.identifier_preparer
+        fact = preparer.quote(table_name)
+        natural = preparer.quote(f"{table_name}__natural_keys")
+        dimensions = [
+            (
+                preparer.quote(dimension),
+                preparer.quote(natural_key),
+                preparer.quote(surrogate_key),
+                f"d{number}",
+            )
+            for number, (dimension, natural_key, surrogate_key) in enumerate(references)
+        ]
+
+        surrogate_keys = [surrogate_key for _, _, surrogate_key in references]
+        other_columns = [
+            preparer.quote(name)
+            for name in self.live_column_types(table_name)
+            if name not in surrogate_keys
+        ]
+
+        def key_bytes(source, keys):
+            return (
+                " + ".join(f"COALESCE(SUM(pg_column_size({key})), 0)" for key in keys)
+                + f" FROM {source}"
+            )
+
+        def join(source, keys):
+            return f"SELECT count(*) FROM {source} AS f " + " ".join(
+                f"JOIN {dimension} AS {alias} ON {alias}.{key} = f.{key}"
+                for (dimension, _, _, alias), key in zip(dimensions, keys)
+            )
+
+        def best_time(conn, query):
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                conn.execute(text(query)).scalar()
+                timings.append(time.perf_counter() - start)
+            return min(timings)
+
+        with self.engine.begin() as conn:
+            conn.execute(
+                text(
+                    f"CREATE TEMPORARY TABLE {natural} ON COMMIT DROP AS SELECT "
+                    + ", ".join(
+                        [f"f.{name}" for name in other_columns]
+                        + [
+                            f"{alias}.{natural_key}"
+                            for _, natural_key, _, alias in dimensions
+                        ]
+                    )
+                    + f" FROM {fact} AS f "
+                    + " ".join(
+                        f"LEFT JOIN {dimension} AS {alias} ON {alias}.{surrogate_key} = f.{surrogate_key}"
+                        for dimension, _, surrogate_key, alias in dimensions
+                    )
+                )
+            )
+            conn.execute(text(f"ANALYZE {fact}"))
+            conn.execute(text(f"ANALYZE {natural}"))
+            return {
+                "surrogate_table_bytes": conn.execute(
+                    text(
+                        "SELECT CAST(SUM(pg_total_relation_size(relid)) AS BIGINT) "
+                        "FROM pg_partition_tree(CAST(:table_name AS regclass))"
+                    ),
+                    {"table_name": fact},
+                ).scalar(),
+                "natural_table_bytes": conn.execute(
+                    text(
+                        "SELECT pg_total_relation_size(CAST(:table_name AS regclass))"
+                    ),
+                    {"table_name": natural},
+                ).scalar(),
+                "surrogate_bytes": conn.execute(
+                    text(
+                        "SELECT "
+                        + key_bytes(fact, [key for _, _, key, _ in dimensions])
+                    )
+                ).scalar(),
+                "natural_bytes": conn.execute(
+                    text(
+                        "SELECT "
+                        + key_bytes(natural, [key for _, key, _, _ in dimensions])
+                    )
+                ).scalar(),
+                "surrogate_join_seconds": best_time(
+                    conn, join(fact, [key for _, _, key, _ in dimensions])
+                ),
+                "natural_join_seconds": best_time(
+                    conn, join(natural, [key for _, key, _, _ in dimensions])
+                ),
+            }
+
+    def table_size(self, table_name):
+        """
+        Returns the total on-disk size of a table, including its indexes and partitions.
+
+        Args:
+            table_name (str): The name of the table.
+
+        Returns:
+            str: The size in human-readable units, e.g. "45 MB".
+        """
+        with self.engine.connect() as conn:
+            return conn.execute(
+                text(
+                    "SELECT pg_size_pretty(SUM(pg_total_relation_size(relid))) "
+                    "FROM pg_partition_tree(CAST(:table_name AS regclass))"
+                ),
+                {
+                    "table_name": self.engine.dialect.identifier_preparer.quote(
+                        table_name
+                    )
+                },
+            ).scalar()
+
+    def upload_to_db(self, df, table_name, if_exists="fail", dtype=None, method=None):
         """
         Uploads a DataFrame to a database table.
 
         Args:
             df (pandas.DataFrame): The DataFrame to upload.
             table_name (str): The name of the database table to which the DataFrame will be uploaded.
+            if_exists (str, optional): What to do if the table already exists ("fail", "replace" or "append"). Defaults to "fail".
+            dtype (dict, optional): The SQLAlchemy types of columns whose type should not be inferred from the DataFrame.
+            method (callable, optional): The pandas insertion method, e.g. ``copy_insert`` for bulk loads. Defaults to INSERT statements.
+
+        Returns:
+            bool: True if the rows were written, False if the upload failed.
 
         The method prints a success message or an error if the upload fails.
         """
         with self.engine.connect() as conn:
             try:
-                df.to_sql(table_name, conn, index=False)
+                df.to_sql(
+                    table_name,
+                    conn,
+                    index=False,
+                    if_exists=if_exists,
+                    dtype=dtype,
+                    method=method,
+                )
             except ValueError as err:
                 print(err.__str__())
-            else:
-                print(f"{table_name} connected.")
+                return False
+            print(f"{table_name} connected.")
+            return True
+
+    def create_indexes(self, table_name, indexes):
+        """
+        Creates the indexes of a table that do not exist yet.
+
+        The indexes are named like those built by ``swap_upload``, so a later swap does not duplicate them.
+
+        Args:
+            table_name (str): The name of the table.
+            indexes (list): The column lists to build indexes on, e.g. [["year", "datetime"]].
+        """
+        preparer = self.engine.dialect.identifier_preparer
+        with self.engine.begin() as conn:
+            for columns in indexes:
+                index_name = f"{table_name}_{'_'.join(columns)}_idx"
+                index_columns = ", ".join(preparer.quote(column) for column in columns)
+                conn.execute(
+                    text(
+                        f"CREATE INDEX IF NOT EXISTS {preparer.quote(index_name)} "
+                        f"ON {preparer.quote(table_name)} ({index_columns})"
+                    )
+                )
+
+    def swap_upload(
+        self, df, table_name, indexes=(), primary_key=None, unique=(), dtype=None
+    ):
+        """
+        Fully reloads a database table without readers ever seeing it missing or half-written.
+
+        The DataFrame is bulk-copied into an UNLOGGED staging table, which then gets its primary key
+        and indexes and is set LOGGED. When the live table exists, the staging table takes its column
+        types, so types changed after the first load (e.g. by the Milestone 3 queries) are kept.
+        The live table is replaced by the staging table with renames inside a single transaction,
+        so running queries see either the old or the new data.
+
+        Foreign keys of other tables referencing the live table are moved to the new one: they are
+        dropped in the swap transaction and added back NOT VALID, then validated afterwards without
+        blocking readers. PostgreSQL cannot add NOT VALID foreign keys on partitioned tables, so theirs
+        are added back, and validated, in a transaction of their own right after the swap. If the new
+        rows lack a key still referenced, the swap is refused with a ValueError before any work is done.
+
+        Args:
+            df (pandas.DataFrame): The DataFrame to upload.
+            table_name (str): The name of the database table to replace.
+            indexes (list, optional): The column lists to build indexes on, e.g. [["year", "datetime"]].
+            primary_key (list, optional): The primary key columns.
+            unique (list, optional): The column lists to add UNIQUE constraints on, e.g. [["store_code"]].
+            dtype (dict, optional): The SQLAlchemy types of columns whose type should not be inferred from the DataFrame.
+        """
+        preparer = self.engine.dialect.identifier_preparer
+        staging_name = f"{table_name}__staging"
+        old_name = f"{table_name}__old"
+        live = preparer.quote(table_name)
+        staging = preparer.quote(staging_name)
+        old = preparer.quote(old_name)
+        index_suffixes = ["_".join(columns) + "_idx" for columns in indexes]
+        unique_suffixes = ["_".join(columns) + "_key" for columns in unique]
+
+        live_types = self.live_column_types(table_name)
+        references = self.referencing_constraints(table_name)
+        for reference in references:
+            if reference["column"] is None:
+                continue
+            with self.engine.connect() as conn:
+                referenced = pd.Series(
+                    conn.execute(
+                        select(column(reference["column"]))
+                        .distinct()
+                        .select_from(table(reference["table"]))
+                        .where(column(reference["column"]).is_not(None))
+                    ).scalars()
+                )
+            missing = ~referenced.isin(df[reference["referred_column"]])
+            if missing.any():
+                raise ValueError(
+                    f"{table_name} was not swapped: {missing.sum()} {reference['column']} values "
+                    f"in {reference['table']} are not in the new rows."
+                )
+
+        with self.engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {staging}"))
+            df.head(0).to_sql(staging_name, conn, index=False, dtype=dtype)
+            kept_types = ", ".join(
+                f"ALTER COLUMN {preparer.quote(name)} TYPE {live_types[name]} "
+                f"USING CAST({preparer.quote(name)} AS {live_types[name]})"
+                for name in df.columns
+                if name in live_types
+            )
+            if kept_types:
+                conn.execute(text(f"ALTER TABLE {staging} {kept_types}"))
+            conn.execute(text(f"ALTER TABLE {staging} SET UNLOGGED"))
+        with self.engine.begin() as conn:
+            df.to_sql(
+                staging_name, conn, index=False, if_exists="append", method=copy_insert
+            )
+        with self.engine.begin() as conn:
+            if primary_key:
+                key_columns = ", ".join(preparer.quote(key) for key in primary_key)
+                conn.execute(
+                    text(
+                        f"ALTER TABLE {staging} ADD CONSTRAINT "
+                        f"{preparer.quote(staging_name + '_pkey')} PRIMARY KEY ({key_columns})"
+                    )
+                )
+            for columns, suffix in zip(unique, unique_suffixes):
+                unique_columns = ", ".join(preparer.quote(column) for column in columns)
+                conn.execute(
+                    text(
+                        f"ALTER TABLE {staging} ADD CONSTRAINT "
+                        f"{preparer.quote(staging_name + '_' + suffix)} UNIQUE ({unique_columns})"
+                    )
+                )
+            for columns, suffix in zip(indexes, index_suffixes):
+                index_columns = ", ".join(preparer.quote(column) for column in columns)
+                conn.execute(
+                    text(
+                        f"CREATE INDEX {preparer.quote(staging_name + '_' + suffix)} "
+                        f"ON {staging} ({index_columns})"
+                    )
+                )
+            conn.execute(text(f"ALTER TABLE {staging} SET LOGGED"))
+        with self.engine.begin() as conn:
+            for reference in references:
+                conn.execute(
+                    text(
+                        f"ALTER TABLE {preparer.quote(reference['table'])} "
+                        f"DROP CONSTRAINT {preparer.quote(reference['name'])}"
+                    )
+                )
+            conn.execute(text(f"DROP TABLE IF EXISTS {old}"))
+            conn.execute(text(f"ALTER TABLE IF EXISTS {live} RENAME TO {old}"))
+            conn.execute(text(f"ALTER TABLE {staging} RENAME TO {live}"))
+            conn.execute(text(f"DROP TABLE IF EXISTS {old}"))
+            if primary_key:
+                index_suffixes.append("pkey")
+            for suffix in index_suffixes + unique_suffixes:
+                conn.execute(
+                    text(
+                        f"ALTER INDEX {preparer.quote(staging_name + '_' + suffix)} "
+                        f"RENAME TO {preparer.quote(table_name + '_' + suffix)}"
+                    )
+                )
+            for reference in references:
+                if not reference["partitioned"]:
+                    conn.execute(
+                        text(
+                            f"ALTER TABLE {preparer.quote(reference['table'])} "
+                            f"ADD CONSTRAINT {preparer.quote(reference['name'])} "
+                            f"{reference['definition']} NOT VALID"
+                        )
+                    )
+        print(f"{table_name} swapped in.")
+        for reference in references:
+            referencing = preparer.quote(reference["table"])
+            name = preparer.quote(reference["name"])
+            with self.engine.begin() as conn:
+                if reference["partitioned"]:
+                    conn.execute(
+                        text(
+                            f"ALTER TABLE {referencing} ADD CONSTRAINT {name} "
+                            f"{reference['definition']}"
+                        )
+                    )
+                else:
+                    conn.execute(
+                        text(f"ALTER TABLE {referencing} VALIDATE CONSTRAINT {name}")
+                    )
+            print(
+                f"{reference['table']}.{reference['name']} moved to the new {table_name}."
+            )
+
+    def live_column_types(self, table_name):
+        """
+        Returns the SQL types of the columns of a table.
+
+        Args:
+            table_name (str): The name of the table.
+
+        Returns:
+            dict: A dictionary mapping each column name to its type, e.g. "character varying(12)",
+                empty if the table does not exist.
+        """
+        with self.engine.connect() as conn:
+            return dict(
+                conn.execute(
+                    text(
+                        "SELECT attname, format_type(atttypid, atttypmod) FROM pg_attribute "
+                        "WHERE attrelid = to_regclass(:table_name) "
+                        "AND attnum > 0 AND NOT attisdropped"
+                    ),
+                    {
+                        "table_name": self.engine.dialect.identifier_preparer.quote(
+                            table_name
+                        )
+                    },
+                ).all()
+            )
+
+    def referencing_constraints(self, table_name):
+        """
+        Lists the foreign keys of other tables that reference a table.
+
+        Foreign keys that partitions inherit from their partitioned table are listed once, on the partitioned table.
+
+        Args:
+            table_name (str): The name of the referenced table.
+
+        Returns:
+            list: A dictionary for each foreign key, empty if the table does not exist, with the
+                referencing "table", whether it is "partitioned", the constraint "name" and "definition",
+                and for single-column keys the referencing "column" and the "referred_column".
+        """
+        with self.engine.connect() as conn:
+            return [
+                dict(row._mapping)
+                for row in conn.execute(
+                    text(
+                        "SELECT referencing.relname AS table, "
+                        "referencing.relkind = 'p' AS partitioned, conname AS name, "
+                        "pg_get_constraintdef(pg_constraint.oid) AS definition, "
+                        "CASE WHEN cardinality(conkey) = 1 THEN referencing_column.attname END AS column, "
+                        "CASE WHEN cardinality(conkey) = 1 THEN referred_column.attname END AS referred_column "
+                        "FROM pg_constraint "
+                        "JOIN pg_class referencing ON referencing.oid = conrelid "
+                        "JOIN pg_attribute referencing_column "
+                        "ON referencing_column.attrelid = conrelid AND referencing_column.attnum = conkey[1] "
+                        "JOIN pg_attribute referred_column "
+                        "ON referred_column.attrelid = confrelid AND referred_column.attnum = confkey[1] "
+                        "WHERE contype = 'f' AND conparentid = 0 "
+                        "AND confrelid = to_regclass(:table_name)"
+                    ),
+                    {
+                        "table_name": self.engine.dialect.identifier_preparer.quote(
+                            table_name
+                        )
+                    },
+                )
+            ]
+
+    def merge_upload(
+        self,
+        df,
+        table_name,
+        natural_key,
+        surrogate_key=None,
+        hash_column="row_hash",
+        dtype=None,
+    ):
+        """
+        Writes only the rows of a dimension table that were inserted, updated or deleted since the last load.
+
+        The row hashes of the DataFrame are compared with those stored in the table. New and changed
+        rows are bulk-copied into an UNLOGGED staging table and merged with INSERT ... ON CONFLICT on
+        the natural key, overwriting the changed rows in place (SCD type 1) so their surrogate keys stay
+        the same. Rows whose natural key is no longer in the DataFrame are deleted, unless a foreign
+        key of another table still references them; those are kept and counted. The whole merge runs
+        in one transaction. If the table does not exist yet, it is uploaded in full.
+        The natural key gets a UNIQUE constraint named ``<table>_<natural_key>_key``, as with
+        ``swap_upload``, unless a unique constraint or index already covers it.
+
+        Args:
+            df (pandas.DataFrame): The full dimension data, with a hash column.
+            table_name (str): The name of the dimension table.
+            natural_key (str): The natural key column the rows are matched on.
+            surrogate_key (str, optional): The surrogate key column, which is never overwritten.
+            hash_column (str, optional): The row hash column. Defaults to "row_hash".
+            dtype (dict, optional): The SQLAlchemy types of columns whose type should not be inferred, used when the table is created.
+        """
+        preparer = self.engine.dialect.identifier_preparer
+        staging_name = f"{table_name}__merge"
+        live = preparer.quote(table_name)
+        staging = preparer.quote(staging_name)
+        key = preparer.quote(natural_key)
+
+        if not inspect(self.engine).has_table(table_name):
+            self.upload_to_db(df, table_name, dtype=dtype)
+            self.add_unique_key(table_name, natural_key)
+            return
+        self.add_unique_key(table_name, natural_key)
+        with self.engine.begin() as conn:
+            conn.execute(
+                text(
+                    f"ALTER TABLE {live} ADD COLUMN IF NOT EXISTS "
+                    f"{preparer.quote(hash_column)} BIGINT"
+                )
+            )
+            stored_df = pd.read_sql(
+                select(column(natural_key), column(hash_column)).select_from(
+                    table(table_name)
+                ),
+                conn,
+            )
+        stored_hashes = pd.Series(
+            stored_df[hash_column].to_numpy(),
+            index=stored_df[natural_key].astype(str),
+            dtype="Int64",
+        )
+        natural_keys = df[natural_key].astype(str)
+        inserted = ~natural_keys.isin(stored_hashes.index)
+        updated = ~inserted & (
+            natural_keys.map(stored_hashes) != df[hash_column]
+        ).fillna(True)
+        changed_df = df[inserted | updated].drop_duplicates(natural_key, keep="last")
+        deleted_keys = stored_hashes.index[~stored_hashes.index.isin(natural_keys)]
+
+        columns = ", ".join(preparer.quote(name) for name in df.columns)
+        updates = ", ".join(
+            f"{preparer.quote(name)} = EXCLUDED.{preparer.quote(name)}"
+            for name in df.columns
+            if name not in (natural_key, surrogate_key)
+        )
+        references = (
+            [
+                reference
+                for reference in self.referencing_constraints(table_name)
+                if reference["column"] is not None
+            ]
+            if len(deleted_keys)
+            else []
+        )
+        with self.engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {staging}"))
+            conn.execute(text(f"CREATE UNLOGGED TABLE {staging} (LIKE {live})"))
+            changed_df.to_sql(
+                staging_name, conn, index=False, if_exists="append", method=copy_insert
+            )
+            conn.execute(
+                text(
+                    f"INSERT INTO {live} ({columns}) SELECT {columns} FROM {staging} "
+                    f"ON CONFLICT ({key}) DO UPDATE SET {updates}"
+                )
+            )
+            deleted = 0
+            if len(deleted_keys):
+                unreferenced = "".join(
+                    f" AND NOT EXISTS (SELECT 1 FROM {preparer.quote(reference['table'])} AS referencing "
+                    f"WHERE referencing.{preparer.quote(reference['column'])} "
+                    f"= {live}.{preparer.quote(reference['referred_column'])})"
+                    for reference in references
+                )
+                deleted = conn.execute(
+                    text(
+                        f"DELETE FROM {live} WHERE CAST({key} AS TEXT) = ANY(:keys){unreferenced}"
+                    ),
+                    {"keys": list(deleted_keys)},
+                ).rowcount
+            conn.execute(text(f"DROP TABLE {staging}"))
+        kept = len(deleted_keys) - deleted
+        print(
+            f"{table_name} merged: {inserted.sum()} inserted, {updated.sum()} updated, "
+            f"{deleted} deleted, {len(df) - inserted.sum() - updated.sum()} unchanged."
+            + (f" {kept} missing rows kept, still referenced." if kept else "")
+        )
+
+    def add_unique_key(self, table_name, column_name):
+        """
+        Adds a UNIQUE constraint named ``<table>_<column>_key`` on a column, unless a unique constraint or index already covers it.
+
+        Args:
+            table_name (str): The name of the table.
+            column_name (str): The column that must be unique.
+        """
+        inspector = inspect(self.engine)
+        covering = [
+            constraint["column_names"]
+            for constraint in inspector.get_unique_constraints(table_name)
+        ] + [
+            index["column_names"]
+            for index in inspector.get_indexes(table_name)
+            if index["unique"]
+        ]
+        if [column_name] in covering:
+            return
+        preparer = self.engine.dialect.identifier_preparer
+        with self.engine.begin() as conn:
+            conn.execute(
+                text(
+                    f"ALTER TABLE {preparer.quote(table_name)} ADD CONSTRAINT "
+                    f"{preparer.quote(table_name + '_' + column_name + '_key')} "
+                    f"UNIQUE ({preparer.quote(column_name)})"
+                )
+            )
+
+    def partitioned_upload(
+        self, df, table_name, partition_column, interval="year", if_exists="fail"
+    ):
+        """
+        Uploads a DataFrame to a table partitioned by range on a date column.
+
+        The table is created with PARTITION BY RANGE on ``partition_column`` and a DEFAULT partition for
+        rows without a date. A partition is created for every year (or month) present in the DataFrame,
+        and each group of rows is copied straight into its partition, so queries filtering on the
+        partition column only scan the matching partitions.
+
+        Args:
+            df (pandas.DataFrame): The DataFrame to upload.
+            table_name (str): The name of the partitioned table.
+            partition_column (str): The date column to partition on.
+            interval (str, optional): The partition size, "year" or "month". Defaults to "year".
+            if_exists (str, optional): What to do if the table already exists ("fail", "replace" or "append"). Defaults to "fail".
+                "replace" loads the new rows with ``replace_partitions``, so readers are not blocked during the load.
+
+        Returns:
+            bool: True if the rows were written, False if the table already exists and ``if_exists`` is "fail".
+
+        The method prints a success message or an error if the upload fails.
+        """
+        preparer = self.engine.dialect.identifier_preparer
+        periods = df[partition_column].dt.to_period("Y" if interval == "year" else "M")
+        with self.engine.begin() as conn:
+            exists = inspect(conn).has_table(table_name)
+        if exists and if_exists == "fail":
+            print(f"Table '{table_name}' already exists.")
+            return False
+        if exists and if_exists == "replace":
+            self.replace_partitions(df, table_name, partition_column, interval=interval)
+            return True
+        with self.engine.begin() as conn:
+            if not exists:
+                schema = pd.io.sql.get_schema(
+                    df, table_name, con=conn, dtype={partition_column: Date}
+                )
+                conn.execute(
+                    text(
+                        f"{schema} PARTITION BY RANGE "
+                        f"({preparer.quote(partition_column)})"
+                    )
+                )
+                conn.execute(
+                    text(
+                        f"CREATE TABLE {preparer.quote(table_name + '_default')} "
+                        f"PARTITION OF {preparer.quote(table_name)} DEFAULT"
+                    )
+                )
+            for period, partition_df in df.groupby(periods, dropna=False):
+                partition_name, bound, _ = self.partition_bounds(
+                    table_name, partition_column, period, interval
+                )
+                if not pd.isna(period):
+                    conn.execute(
+                        text(
+                            f"CREATE TABLE IF NOT EXISTS {preparer.quote(partition_name)} "
+                            f"PARTITION OF {preparer.quote(table_name)} {bound}"
+                        )
+                    )
+                partition_df.to_sql(
+                    partition_name,
+                    conn,
+                    index=False,
+                    if_exists="append",
+                    method=copy_insert,
+                )
+        print(f"{table_name} connected.")
+        return True
+
+    def partition_bounds(self, table_name, partition_column, period, interval="year"):
+        """
+        Returns the name and bounds of the partition holding one period of a partitioned table.
+
+        Args:
+            table_name (str): The name of the partitioned table.
+            partition_column (str): The date column the table is partitioned on.
+            period (pandas.Period): The year or month of the partition, or NaT for the DEFAULT partition.
+            interval (str, optional): The partition size, "year" or "month". Defaults to "year".
+
+        Returns:
+            tuple: The partition name, its bound clause (e.g. "FOR VALUES FROM (...) TO (...)"), and a
+                CHECK condition that only rows within the bounds meet.
+        """
+        column_name = self.engine.dialect.identifier_preparer.quote(partition_column)
+        if pd.isna(period):
+            return f"{table_name}_default", "DEFAULT", f"{column_name} IS NULL"
+        start = f"'{period.start_time:%Y-%m-%d}'"
+        end = f"'{(period + 1).start_time:%Y-%m-%d}'"
+        return (
+            f"{table_name}_{period.strftime('%Y' if interval == 'year' else '%Y_%m')}",
+            f"FOR VALUES FROM ({start}) TO ({end})",
+            f"{column_name} IS NOT NULL AND {column_name} >= {start} AND {column_name} < {end}",
+        )
+
+    def replace_partitions(self, df, table_name, partition_column, interval="year"):
+        """
+        Replaces every partition of a partitioned table with the rows of a DataFrame.
+
+        Each year (or month) of rows, and the rows without a date, are copied into a standalone staging
+        table created LIKE the partitioned table, with its indexes and foreign keys, while readers keep
+        querying the old partitions. A CHECK constraint matching the partition bounds lets PostgreSQL
+        attach the staging tables without scanning them. The old partitions are then detached and the
+        staging tables attached in one short transaction, so readers see either the old or the new rows
+        and are only blocked for the swap itself.
+
+        Args:
+            df (pandas.DataFrame): The rows that replace the table's rows.
+            table_name (str): The name of the partitioned table.
+            partition_column (str): The date column the table is partitioned on.
+            interval (str, optional): The partition size, "year" or "month". Defaults to "year".
+        """
+        preparer = self.engine.dialect.identifier_preparer
+        parent = preparer.quote(table_name)
+        periods = df[partition_column].dt.to_period("Y" if interval == "year" else "M")
+        with self.engine.connect() as conn:
+            parameters = {"table_name": parent}
+            foreign_keys = conn.execute(
+                text(
+                    "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+                    "WHERE conrelid = to_regclass(:table_name) AND contype = 'f'"
+                ),
+                parameters,
+            ).all()
+            old_partitions = (
+                conn.execute(
+                    text(
+                        "SELECT relname FROM pg_inherits JOIN pg_class ON pg_class.oid = inhrelid "
+                        "WHERE inhparent = to_regclass(:table_name)"
+                    ),
+                    parameters,
+                )
+                .scalars()
+                .all()
+            )
+
+        groups = [
+            (period, partition_df)
+            for period, partition_df in df.groupby(periods, dropna=False)
+        ]
+        if not any(pd.isna(period) for period, _ in groups):
+            groups.append((pd.NaT, df.iloc[0:0]))
+        new_partitions = []
+        for period, partition_df in groups:
+            partition_name, bound, check = self.partition_bounds(
+                table_name, partition_column, period, interval
+            )
+            staging_name = f"{partition_name}__staging"
+            staging = preparer.quote(staging_name)
+            with self.engine.begin() as conn:
+                conn.execute(text(f"DROP TABLE IF EXISTS {staging}"))
+                conn.execute(
+                    text(f"CREATE TABLE {staging} (LIKE {parent} INCLUDING ALL)")
+                )
+                conn.execute(
+                    text(
+                        f"ALTER TABLE {staging} ADD CONSTRAINT "
+                        f"{preparer.quote(staging_name + '_bounds')} CHECK ({check})"
+                    )
+                )
+                partition_df.to_sql(
+                    staging_name,
+                    conn,
+                    index=False,
+                    if_exists="append",
+                    method=copy_insert,
+                )
+            with self.engine.begin() as conn:
+                for name, definition in foreign_keys:
+                    conn.execute(
+                        text(
+                            f"ALTER TABLE {staging} ADD CONSTRAINT "
+                            f"{preparer.quote(name)} {definition}"
+                        )
+                    )
+            new_partitions.append((staging_name, partition_name, bound))
+        # The DEFAULT partition is attached last, so attaching the others does not scan it.
+        new_partitions.sort(key=lambda partition: partition[2] == "DEFAULT")
+
+        with self.engine.begin() as conn:
+            for partition_name in old_partitions:
+                conn.execute(
+                    text(
+                        f"ALTER TABLE {parent} DETACH PARTITION {preparer.quote(partition_name)}"
+                    )
+                )
+                conn.execute(
+                    text(
+                        f"ALTER TABLE {preparer.quote(partition_name)} "
+                        f"RENAME TO {preparer.quote(partition_name + '__old')}"
+                    )
+                )
+            for staging_name, partition_name, bound in new_partitions:
+                conn.execute(
+                    text(
+                        f"ALTER TABLE {preparer.quote(staging_name)} "
+                        f"RENAME TO {preparer.quote(partition_name)}"
+                    )
+                )
+                conn.execute(
+                    text(
+                        f"ALTER TABLE {parent} ATTACH PARTITION "
+                        f"{preparer.quote(partition_name)} {bound}"
+                    )
+                )
+                conn.execute(
+                    text(
+                        f"ALTER TABLE {preparer.quote(partition_name)} "
+                        f"DROP CONSTRAINT {preparer.quote(staging_name + '_bounds')}"
+                    )
+                )
+                index_names = conn.execute(
+                    text(
+                        "SELECT relname FROM pg_index JOIN pg_class ON pg_class.oid = indexrelid "
+                        "WHERE indrelid = to_regclass(:partition_name)"
+                    ),
+                    {"partition_name": preparer.quote(partition_name)},
+                ).scalars()
+                for index_name in index_names:
+                    if index_name.startswith(staging_name):
+                        conn.execute(
+                            text(
+                                f"ALTER INDEX {preparer.quote(index_name)} RENAME TO "
+                                f"{preparer.quote(partition_name + index_name[len(staging_name):])}"
+                            )
+                        )
+            for partition_name in old_partitions:
+                conn.execute(
+                    text(f"DROP TABLE {preparer.quote(partition_name + '__old')}")
+                )
+        print(f"{table_name} replaced: {len(new_partitions)} partitions swapped in.")
+
+    def detach_partition(self, table_name, partition_name):
+        """
+        Detaches a partition from a partitioned table, leaving it as a standalone table to archive or drop.
+
+        Args:
+            table_name (str): The name of the partitioned table.
+            partition_name (str): The name of the partition to detach, e.g. "orders_table_1993".
+        """
+        preparer = self.engine.dialect.identifier_preparer
+        with self.engine.begin() as conn:
+            conn.execute(
+                text(
+                    f"ALTER TABLE {preparer.quote(table_name)} "
+                    f"DETACH PARTITION {preparer.quote(partition_name)}"
+                )
+            )
+        print(f"{partition_name} detached from {table_name}.")
@@ -0,0 +1,209 @@
+import hashlib
+import json
+import re
+import sqlite3
+import time
+from collections import Counter
+from email.utils import parsedate_to_datetime
+
+
+class ResponseCache:
+    """
+    This class provides a persistent, size-bounded HTTP response cache stored in SQLite.
+
+    Entries are keyed by URL and request headers (so responses fetched with different API keys are kept
+    apart) and honour the ETag, Last-Modified and Cache-Control headers of the response. Responses
+    without freshness information stay fresh for ``default_ttl`` seconds. When the cache grows beyond
+    ``max_bytes``, the least recently used entries are evicted.
+    """
+
+    def __init__(
+        self, path=".response_cache.sqlite", default_ttl=86400, max_bytes=100_000_000
+    ):
+        """
+        Initializes an instance of the ResponseCache class.
+
+        Args:
+            path (str, optional): The path to the SQLite database. Defaults to ".response_cache.sqlite".
+            default_ttl (int, optional): The freshness lifetime in seconds of responses without Cache-Control. Defaults to one day.
+            max_bytes (int, optional): The maximum total size of the cached bodies. Defaults to 100 MB.
+        """
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self.stats = Counter()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                url TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                body BLOB,
+                size INTEGER,
+                expires_at REAL,
+                last_used REAL
+            )
+            """)
+        self.conn.commit()
+
+    @staticmethod
+    def cache_key(url, headers):
+        """
+        Builds the cache key of a request from its URL and headers.
+
+        Args:
+            url (str): The request URL.
+            headers (dict): The request headers, e.g. the API key.
+
+        Returns:
+            str: The hex digest identifying the request.
+        """
+        scope = json.dumps(sorted((headers or {}).items()))
+        return hashlib.sha256(f"{url}\0{scope}".encode("utf-8")).hexdigest()
+
+    def expires_at(self, response_headers):
+        """
+        Works out when a response stops being fresh from its Cache-Control and Expires headers.
+
+        Args:
+            response_headers (Mapping): The response headers.
+
+        Returns:
+            float or None: The expiry time as a Unix timestamp, or None if the response must not be stored.
+        """
+        now = time.time()
+        cache_control = response_headers.get("Cache-Control", "").lower()
+        if "no-store" in cache_control:
+            return None
+        if "no-cache" in cache_control:
+            return now
+        max_age = re.search(r"max-age=(\d+)", cache_control)
+        if max_age:
+            return now + int(max_age.group(1))
+        if "Expires" in response_headers:
+            try:
+                return parsedate_to_datetime(response_headers["Expires"]).timestamp()
+            except (TypeError, ValueError):
+                return now
+        return now + self.default_ttl
+
+    def get(self, key):
+        """
+        Looks up a cached response.
+
+        Args:
+            key (str): The cache key of the request.
+
+        Returns:
+            dict or None: The cached entry with "etag", "last_modified", "body" and "expires_at", or None.
+        """
+        row = self.conn.execute(
+            "SELECT etag, last_modified, body, expires_at FROM responses WHERE key = ?",
+            (key,),
+        ).fetchone()
+        if row is None:
+            return None
+        self.conn.execute(
+            "UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key)
+        )
+        self.conn.commit()
+        return dict(zip(("etag", "last_modified", "body", "expires_at"), row))
+
+    @staticmethod
+    def is_fresh(entry):
+        """
+        Checks whether a cached entry can be served without contacting the server.
+
+        Args:
+            entry (dict): The cached entry.
+
+        Returns:
+            bool: True if the entry has not expired.
+        """
+        return entry["expires_at"] > time.time()
+
+    @staticmethod
+    def conditional_headers(entry):
+        """
+        Builds the headers that make a request conditional on a cached entry having changed.
+
+        Args:
+            entry (dict): The cached entry, or None.
+
+        Returns:
+            dict: The If-None-Match and If-Modified-Since headers available for the entry.
+        """
+        headers = {}
+        if entry is None:
+            return headers
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(self, key, url, body, response_headers):
+        """
+        Stores a response and evicts the least recently used entries if the cache is over its size bound.
+
+        Args:
+            key (str): The cache key of the request.
+            url (str): The request URL.
+            body (bytes): The response body.
+            response_headers (Mapping): The response headers.
+        """
+        expires_at = self.expires_at(response_headers)
+        if expires_at is None or len(body) > self.max_bytes:
+            return
+        self.conn.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                key,
+                url,
+                response_headers.get("ETag"),
+                response_headers.get("Last-Modified"),
+                body,
+                len(body),
+                expires_at,
+                time.time(),
+            ),
+        )
+        self.evict()
+        self.conn.commit()
+
+    def refresh(self, key, response_headers):
+        """
+        Extends the freshness of an entry the server confirmed as unchanged (HTTP 304).
+
+        Args:
+            key (str): The cache key of the request.
+            response_headers (Mapping): The headers of the 304 response.
+        """
+        expires_at = self.expires_at(response_headers)
+        if expires_at is None:
+            self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+        else:
+            self.conn.execute(
+                "UPDATE responses SET expires_at = ? WHERE key = ?", (expires_at, key)
+            )
+        self.conn.commit()
+
+    def evict(self):
+        """
+        Deletes the least recently used entries until the cached bodies fit within ``max_bytes``.
+        """
+        (total,) = self.conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        if total <= self.max_bytes:
+            return
+        evicted = []
+        for key, size in self.conn.execute(
+            "SELECT key, size FROM responses ORDER BY last_used"
+        ):
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        self.conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+        self.stats["evicted"] += len(evicted)
@@ -0,0 +1,654 @@
+import argparse
+import re
+
+STORE_API_ENDPOINTS = {
+    "number_stores": "https://aqj7u5id95.execute-api.eu-west-1.amazonaws.com/prod/number_stores",
+    "store_details": "https://aqj7u5id95.execute-api.eu-west-1.amazonaws.com/prod/store_details/{store_number}",
+}
+CARD_DETAILS_PDF = (
+    "https://data-handling-public.s3.eu-west-1.amazonaws.com/card_details.pdf"
+)
+PRODUCTS_CSV = "s3://data-handling-public/products.csv"
+DATE_DETAILS_JSON = (
+    "https://data-handling-public.s3.eu-west-1.amazonaws.com/date_details.json"
+)
+STORE_COLUMNS = [
+    "index",
+    "store_code",
+    "store_type",
+    "staff_numbers",
+    "address",
+    "longitude",
+    "latitude",
+    "locality",
+    "country_code",
+    "continent",
+    "opening_date",
+]
+PRODUCT_COLUMNS = [
+    "product_name",
+    "product_price",
+    "weight",
+    "weight_class",
+    "category",
+    "EAN",
+    "date_added",
+    "uuid",
+    "still_available",
+    "product_code",
+]
+RDS_TABLES = ["legacy_users", "orders_table"]
+RDS_TABLE_CACHE = {}
+TABLE_INDEXES = {
+    "dim_date_times": [["year", "datetime"]],
+}
+STAGED_CLEANING_STEPS = {
+    "dim_users_table": [("clean_user_data", {})],
+    "dim_card_details": [("clean_card_data", {})],
+    "dim_store_details": [("clean_store_data", {})],
+    "dim_products": [
+        ("clean_unknown_string", {"required": ["weight"]}),
+        ("convert_product_weights", {}),
+        ("clean_products_data", {}),
+    ],
+    "orders_table": [("clean_orders_data", {})],
+    "dim_date_times": [("clean_date_data", {})],
+}
+
+
+def column_types(table_name):
+    """
+    Returns the SQL types of the columns whose final type pandas does not infer, so tables are
+    created with their final types and need no ALTER TABLE or UPDATE after the load.
+
+    Args:
+        table_name (str): The name of the table being loaded.
+
+    Returns:
+        dict: The SQLAlchemy type of each column, or None if every type is inferred.
+    """
+    from sqlalchemy import Date, String, Uuid
+
+    return {
+        "dim_products": {
+            "weight_class": String(20),
+            "category": String(255),
+            "EAN": String(20),
+            "date_added": Date,
+            "uuid": Uuid(as_uuid=False),
+            "product_code": String(20),
+        },
+    }.get(table_name)
+
+
+def connect_local(args, profile=None):
+    """
+    Connects to the local database the cleaned tables are loaded into.
+
+    Args:
+        args (argparse.Namespace): The parsed command line arguments.
+        profile (str, optional): The connection profile suited to the command, unless --profile overrides it.
+
+    Returns:
+        DatabaseConnector: A connector with an initialised engine.
+    """
+    from database_utils import DatabaseConnector
+
+    local_connector = DatabaseConnector()
+    local_creds = local_connector.read_db_creds(args.local_creds)
+    local_connector.init_db_engine(local_creds, profile=args.profile or profile)
+    return local_connector
+
+
+def response_cache(args):
+    """
+    Opens the persistent HTTP response cache, unless caching is disabled.
+
+    Args:
+        args (argparse.Namespace): The parsed command line arguments.
+
+    Returns:
+        ResponseCache: The response cache, or None if --no-cache was given.
+    """
+    if args.no_cache:
+        return None
+    from response_cache import ResponseCache
+
+    return ResponseCache()
+
+
+def read_rds_table(args, table):
+    """
+    Reads a table from the legacy RDS, in parallel key ranges over one pooled engine.
+
+    Tables named with --prefetch are read concurrently with it and kept for later loads in the same
+    process (e.g. main.py), so only the tables the caller will load are read. Each table is handed
+    out once, so it is not held in memory after its load.
+
+    Args:
+        args (argparse.Namespace): The parsed command line arguments.
+        table (str): The name of the RDS table, e.g. "legacy_users".
+
+    Returns:
+        pandas.DataFrame: The table data.
+    """
+    from data_extraction import DataExtractor
+    from database_utils import DatabaseConnector
+
+    if table not in RDS_TABLE_CACHE:
+        tables = [table] + [
+            prefetched
+            for prefetched in args.prefetch
+            if prefetched != table and prefetched not in RDS_TABLE_CACHE
+        ]
+        RDS_TABLE_CACHE.update(
+            DataExtractor.read_rds_tables(DatabaseConnector(), tables, args.creds)
+        )
+    return RDS_TABLE_CACHE.pop(table)
+
+
+def extract_users(args, cleaner):
+    """
+    Extracts and cleans the legacy users table from the RDS (Milestone 2.3).
+    """
+    user_df = read_rds_table(args, "legacy_users")
+    cleaner.clean_user_data(user_df, index_col="index")
+    return user_df
+
+
+def extract_card_details(args, cleaner):
+    """
+    Extracts and cleans the card details PDF (Milestone 2.4).
+    """
+    from data_extraction import DataExtractor
+
+    card_df = DataExtractor.retrieve_pdf_data(
+        CARD_DETAILS_PDF, cache=response_cache(args)
+    )
+    cleaner.clean_card_data(card_df)
+    return card_df
+
+
+def extract_store_details(args, cleaner):
+    """
+    Extracts and cleans the store details from the stores API (Milestone 2.5).
+    """
+    from data_extraction import DataExtractor
+
+    with open(args.api_key, "r") as f:
+        headers = {"x-api-key": f.read()}
+    cache = response_cache(args)
+    number_of_stores = DataExtractor.list_number_of_stores(
+        STORE_API_ENDPOINTS["number_stores"], headers, cache=cache
+    )
+    store_df = DataExtractor.retrieve_stores_data(
+        STORE_API_ENDPOINTS["store_details"], headers, number_of_stores, cache=cache
+    )
+    store_df = store_df.reindex(columns=STORE_COLUMNS)
+    cleaner.clean_store_data(store_df, index_col="index")
+    return store_df
+
+
+def extract_products(args, cleaner):
+    """
+    Extracts and cleans the products CSV from S3 (Milestone 2.6).
+    """
+    from data_extraction import DataExtractor
+
+    product_df = DataExtractor.extract_from_s3(PRODUCTS_CSV)
+    cleaner.clean_unknown_string(product_df, required=["weight"])
+    cleaner.convert_product_weights(product_df)
+    cleaner.clean_products_data(product_df)
+    return product_df.reindex(columns=PRODUCT_COLUMNS)
+
+
+def read_order_dates(args):
+    """
+    Reads the date of every sale from the local dim_date_times table, which must be loaded first.
+
+    Args:
+        args (argparse.Namespace): The parsed command line arguments.
+
+    Returns:
+        pandas.DataFrame: The "date_uuid" and "datetime" columns of dim_date_times.
+    """
+    import pandas as pd
+
+    with connect_local(args).engine.connect() as conn:
+        return pd.read_sql_table(
+            "dim_date_times", conn, columns=["date_uuid", "datetime"]
+        )
+
+
+def extract_orders(args, cleaner):
+    """
+    Extracts and cleans the orders table from the RDS (Milestone 2.7).
+
+    The order date is looked up in the local dim_date_times table, which must be loaded first.
+    """
+    orders_df = read_rds_table(args, "orders_table")
+    cleaner.clean_orders_data(orders_df)
+    cleaner.add_order_date(orders_df, read_order_dates(args))
+    return orders_df
+
+
+def extract_date_times(args, cleaner):
+    """
+    Extracts and cleans the date details JSON from S3 (Milestone 2.8).
+    """
+    from data_extraction import DataExtractor
+
+    date_df = DataExtractor.extract_from_s3(DATE_DETAILS_JSON)
+    cleaner.clean_date_data(date_df)
+    return date_df
+
+
+EXTRACTORS = {
+    "dim_users_table": extract_users,
+    "dim_card_details": extract_card_details,
+    "dim_store_details": extract_store_details,
+    "dim_products": extract_products,
+    "orders_table": extract_orders,
+    "dim_date_times": extract_date_times,
+}
+
+
+def clean_staged_source(args):
+    """
+    Cleans a staged source file out of core with DuckDB and yields it in batches.
+
+    The source is read and cleaned within the --memory-limit budget, spilling to disk when needed,
+    and only one batch of rows is converted to pandas at a time. The rows dropped by cleaning are
+    yielded last, as rejected batches.
+
+    Args:
+        args (argparse.Namespace): The parsed command line arguments.
+
+    Yields:
+        tuple: A batch of cleaned rows and a batch of rejected rows (with a "reason_codes" column) as DataFrames.
+    """
+    import pandas as pd
+
+    from data_cleaning import DataCleaning
+    from data_cleaning_duckdb import DuckDBDataCleaning
+
+    cleaner = DuckDBDataCleaning(memory_limit=args.memory_limit)
+    cleaner.register_source(args.table, args.source)
+    for step, kwargs in STAGED_CLEANING_STEPS[args.table]:
+        getattr(cleaner, step)(args.table, **kwargs)
+    order_cleaner = DataCleaning()
+    date_df = read_order_dates(args) if args.table == "orders_table" else None
+    no_rejects = pd.DataFrame(columns=["reason_codes"])
+    for batch in cleaner.record_batches(args.table, args.batch_rows):
+        df = batch.to_pandas()
+        if args.table == "dim_products":
+            df = df.reindex(columns=PRODUCT_COLUMNS)
+        elif args.table == "orders_table":
+            order_cleaner.add_order_date(df, date_df)
+        yield df, no_rejects
+    rejected_batches = cleaner.rejected_batches(args.table, args.batch_rows)
+    for batch in rejected_batches or []:
+        yield pd.DataFrame(), batch.to_pandas()
+
+
+def load(args):
+    """
+    Extracts, cleans, validates and uploads one table to the local database.
+
+    Rows dropped by cleaning or rejected by the validation rules are appended to the quarantine table
+    once the valid rows of their batch have been written. A table that already exists is left as it is,
+    unless it is reloaded with --reload or is a dimension table merged by the pandas engine.
+    Dimension tables get integer surrogate keys, and the orders table's natural foreign keys are
+    replaced by them, so the dimension tables must be loaded before the orders table. Dimension rows
+    also get a content hash, and reloading a dimension table only writes the rows whose hash changed.
+
+    With --engine duckdb, a staged --source file is cleaned out of core and validated and uploaded
+    batch by batch, so the table does not have to fit in memory.
+
+    Args:
+        args (argparse.Namespace): The parsed command line arguments.
+    """
+    import pandas as pd
+
+    from data_cleaning import DataCleaning
+    from data_validation import VALIDATION_RULES, DataValidator
+    from database_utils import copy_insert
+
+    cleaner = DataCleaning()
+    local_connector = connect_local(args, profile="bulk-load")
+    merged = args.engine == "pandas" and args.table in DataCleaning.SURROGATE_KEYS
+    if (
+        not args.reload
+        and not merged
+        and args.table in local_connector.list_db_tables()
+    ):
+        print(f"Table '{args.table}' already exists.")
+        return
+    if args.engine == "duckdb":
+        batches = clean_staged_source(args)
+    else:
+        df = EXTRACTORS[args.table](args, cleaner)
+        batches = [(df, cleaner.pop_rejected_rows())]
+    validator = DataValidator(local_connector)
+    key_lookup = None
+    if args.table in DataCleaning.SURROGATE_KEYS:
+        natural_key, surrogate_key = DataCleaning.SURROGATE_KEYS[args.table]
+        key_lookup = local_connector.read_key_lookup(
+            args.table, natural_key, surrogate_key
+        )
+    elif args.table == "orders_table":
+        key_lookups = {
+            natural_key: (
+                surrogate_key,
+                local_connector.read_key_lookup(table, natural_key, surrogate_key),
+            )
+            for table, (
+                natural_key,
+                surrogate_key,
+            ) in DataCleaning.SURROGATE_KEYS.items()
+        }
+    dtype = column_types(args.table)
+    if_exists = "fail"
+    for df, rejected_df in batches:
+        df, invalid_df = validator.validate(df, VALIDATION_RULES.get(args.table))
+        rejected_df = pd.concat([rejected_df, invalid_df])
+        if df.empty and args.engine == "duckdb":
+            validator.quarantine(rejected_df, args.table)
+            continue
+        written = True
+        if key_lookup is not None:
+            cleaner.add_row_hash(df)
+            key_lookup = cleaner.assign_surrogate_keys(
+                df, natural_key, surrogate_key, key_lookup
+            )
+        if args.table == "orders_table":
+            cleaner.apply_surrogate_keys(df, key_lookups)
+            written = local_connector.partitioned_upload(
+                df,
+                args.table,
+                "order_date",
+                if_exists="replace" if args.reload else if_exists,
+            )
+        elif args.reload:
+            local_connector.swap_upload(
+                df,
+                args.table,
+                indexes=TABLE_INDEXES.get(args.table, ()),
+                primary_key=[surrogate_key] if key_lookup is not None else None,
+                unique=[[natural_key]] if key_lookup is not None else (),
+                dtype=dtype,
+            )
+        elif key_lookup is not None and args.engine == "pandas":
+            local_connector.merge_upload(
+                df, args.table, natural_key, surrogate_key, dtype=dtype
+            )
+        else:
+            written = local_connector.upload_to_db(
+                df, args.table, if_exists=if_exists, dtype=dtype, method=copy_insert
+            )
+        if not written:
+            return
+        validator.quarantine(rejected_df, args.table)
+        if_exists = "append"
+    if args.table in TABLE_INDEXES and not args.reload:
+        local_connector.create_indexes(args.table, TABLE_INDEXES[args.table])
+    if args.table == "orders_table":
+        foreign_keys = local_connector.compare_foreign_keys(
+            args.table,
+            [
+                (table, natural_key, surrogate_key)
+                for table, (
+                    natural_key,
+                    surrogate_key,
+                ) in DataCleaning.SURROGATE_KEYS.items()
+            ],
+        )
+        print(
+            f"{args.table} with surrogate keys: {foreign_keys['surrogate_table_bytes'] / 1e6:.1f} MB, "
+            f"of which {foreign_keys['surrogate_bytes'] / 1e6:.1f} MB of keys; joining every dimension "
+            f"takes {foreign_keys['surrogate_join_seconds']:.2f}s. With the natural keys they replace: "
+            f"{foreign_keys['natural_table_bytes'] / 1e6:.1f} MB, of which "
+            f"{foreign_keys['natural_bytes'] / 1e6:.1f} MB of keys; "
+            f"{foreign_keys['natural_join_seconds']:.2f}s."
+        )
+
+
+def read_milestone_sql(sql_file, milestone):
+    """
+    Reads the SQL of one milestone from a file sectioned by "-- Milestone X.Y" comments.
+
+    Args:
+        sql_file (str): The path to the SQL file.
+        milestone (str): The milestone number, e.g. "4.3".
+
+    Returns:
+        str: The SQL statements of the milestone.
+    """
+    with open(sql_file, "r") as f:
+        sections = re.split(r"^-- Milestone (\S+)\n", f.read(), flags=re.MULTILINE)
+    milestones = dict(zip(sections[1::2], sections[2::2]))
+    if milestone not in milestones:
+        raise ValueError(
+            f"Milestone {milestone} not found in {sql_file}. "
+            f"Available milestones: {', '.join(milestones)}"
+        )
+    return milestones[milestone]
+
+
+def query(args):
+    """
+    Runs the SQL of one milestone against the local database and prints any returned rows.
+
+    With --explain, the query plan with actual timings is printed instead, to compare join costs.
+
+    Args:
+        args (argparse.Namespace): The parsed command line arguments.
+    """
+    from sqlalchemy import text
+
+    sql = read_milestone_sql(args.sql_file, args.milestone)
+    if args.explain:
+        sql = f"EXPLAIN (ANALYZE, BUFFERS) {sql}"
+    with connect_local(args, profile="analytics").engine.connect() as conn:
+        result = conn.execute(text(sql))
+        if result.returns_rows:
+            for row in result:
+                print(row)
+        conn.commit()
+
+
+def benchmark(args):
+    """
+    Times a bulk insert, an index build, batched updates and an aggregate query under each connection profile.
+
+    Every profile works on a fresh copy of the same synthetic orders-like table, which is dropped afterwards.
+    The "default" profile is the untuned engine, for comparison.
+
+    Args:
+        args (argparse.Namespace): The parsed command line arguments.
+    """
+    import time
+
+    import numpy as np
+    import pandas as pd
+    from sqlalchemy import text
+
+    from database_utils import CONNECTION_PROFILES, DatabaseConnector
+
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(
+        {
+            "order_id": np.arange(args.rows),
+            "store_key": rng.integers(1, 450, args.rows),
+            "product_quantity": rng.integers(1, 14, args.rows),
+            "product_price": rng.random(args.rows).round(2) * 100,
+        }
+    )
+    updates = (
+        df.sample(frac=0.05, random_state=0)[["order_id", "product_price"]]
+        .assign(product_price=lambda sample: sample["product_price"] + 1)
+        .to_dict("records")
+    )
+    connector = DatabaseConnector()
+    creds = connector.read_db_creds(args.local_creds)
+    table_name = "profile_benchmark"
+    steps = {
+        "index": f"CREATE INDEX ON {table_name} (order_id)",
+        "update": f"UPDATE {table_name} SET product_price = :product_price WHERE order_id = :order_id",
+        "query": f"SELECT store_key, SUM(product_quantity * product_price) FROM {table_name} "
+        f"GROUP BY store_key ORDER BY 2 DESC",
+    }
+    print(f"{'profile':<12}" + "".join(f"{step:>10}" for step in ["insert", *steps]))
+    for profile in args.profiles or ["default", *CONNECTION_PROFILES]:
+        engine = connector.init_db_engine(
+            creds, profile=None if profile == "default" else profile
+        )
+        timings = []
+        start = time.perf_counter()
+        with engine.begin() as conn:
+            df.to_sql(table_name, conn, index=False, if_exists="replace")
+        timings.append(time.perf_counter() - start)
+        for step, sql in steps.items():
+            start = time.perf_counter()
+            with engine.begin() as conn:
+                result = conn.execute(text(sql), updates if step == "update" else None)
+                if result.returns_rows:
+                    result.fetchall()
+            timings.append(time.perf_counter() - start)
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE {table_name}"))
+        engine.dispose()
+        print(f"{profile:<12}" + "".join(f"{timing:>9.2f}s" for timing in timings))
+
+
+def build_parser():
+    """
+    Builds the command line argument parser.
+
+    Returns:
+        argparse.ArgumentParser: The parser for the retail-etl command.
+    """
+    parser = argparse.ArgumentParser(
+        prog="retail-etl",
+        description="Extract, clean and load the retail data, and run the milestone queries.",
+    )
+    parser.add_argument(
+        "--local-creds",
+        default="db_creds_local.yaml",
+        help="YAML file with the local database credentials.",
+    )
+    parser.add_argument(
+        "--profile",
+        help="Connection profile to use instead of the command's own "
+        "(loads use bulk-load, queries use analytics).",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    load_parser = subparsers.add_parser(
+        "load", help="Extract, clean and upload a table."
+    )
+    load_parser.add_argument("table", choices=EXTRACTORS)
+    load_parser.add_argument(
+        "--creds",
+        default="db_creds.yaml",
+        help="YAML file with the RDS credentials.",
+    )
+    load_parser.add_argument(
+        "--prefetch",
+        nargs="+",
+        choices=RDS_TABLES,
+        default=[],
+        help="RDS tables to read together with the table's own, for later loads in the same process.",
+    )
+    load_parser.add_argument(
+        "--api-key",
+        default="config/api_key",
+        help="File containing the stores API key.",
+    )
+    load_parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Download API and PDF responses again instead of using the response cache.",
+    )
+    load_parser.add_argument(
+        "--reload",
+        action="store_true",
+        help="Replace an existing table: dimension tables through a staging table and an atomic "
+        "rename, orders_table by loading new partitions on the side and swapping them in.",
+    )
+    load_parser.add_argument(
+        "--engine",
+        choices=["pandas", "duckdb"],
+        default="pandas",
+        help="Clean in memory with pandas, or out of core with DuckDB (requires --source).",
+    )
+    load_parser.add_argument(
+        "--source",
+        help="Staged CSV, JSON or Parquet file (globs allowed) holding the raw table, for --engine duckdb.",
+    )
+    load_parser.add_argument(
+        "--memory-limit",
+        default="2GB",
+        help="Memory budget of the DuckDB engine; it spills to disk beyond it. Defaults to 2GB.",
+    )
+    load_parser.add_argument(
+        "--batch-rows",
+        type=int,
+        default=100_000,
+        help="Number of rows validated and uploaded at a time with --engine duckdb.",
+    )
+    load_parser.set_defaults(func=load)
+
+    query_parser = subparsers.add_parser(
+        "query", help="Run the SQL of a milestone, e.g. 4.3."
+    )
+    query_parser.add_argument("milestone")
+    query_parser.add_argument(
+        "--sql-file",
+        default="sql_queries/sql_queries.sql",
+        help="SQL file sectioned by '-- Milestone X.Y' comments.",
+    )
+    query_parser.add_argument(
+        "--explain",
+        action="store_true",
+        help="Print the query plan with actual timings instead of the rows.",
+    )
+    query_parser.set_defaults(func=query)
+
+    benchmark_parser = subparsers.add_parser(
+        "benchmark", help="Compare the connection profiles on the local database."
+    )
+    benchmark_parser.add_argument(
+        "--rows",
+        type=int,
+        default=200_000,
+        help="Number of rows in the benchmark table. Defaults to 200000.",
+    )
+    benchmark_parser.add_argument(
+        "--profiles",
+        nargs="+",
+        help="Profiles to benchmark. Defaults to the untuned default and every named profile.",
+    )
+    benchmark_parser.set_defaults(func=benchmark)
+    return parser
+
+
+def main(argv=None):
+    """
+    Runs the retail-etl command line interface.
+
+    Args:
+        argv (list, optional): The command line arguments. Defaults to sys.argv.
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if getattr(args, "engine", None) == "duckdb":
+        if args.source is None:
+            parser.error("--engine duckdb requires --source")
+        if args.reload:
+            parser.error("--reload is not supported with --engine duckdb")
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
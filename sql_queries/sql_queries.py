@@ -11,11 +11,6 @@ with engine.connect() as conn:
         text(
             """
                 ALTER TABLE orders_table
-                    ALTER COLUMN date_uuid TYPE uuid USING date_uuid::uuid,
-                    ALTER COLUMN user_uuid TYPE uuid USING user_uuid::uuid,
-                    ALTER COLUMN card_number TYPE varchar(19),
-                    ALTER COLUMN store_code TYPE varchar(12),
-                    ALTER COLUMN product_code TYPE varchar(11),
                     ALTER COLUMN product_quantity TYPE int2
             """
         )
@@ -64,69 +59,6 @@ with engine.connect() as conn:
         )
     )
     conn.commit()
-# %% Milestone 3.4
-local_connector = DatabaseConnector()
-local_creds = local_connector.read_db_creds("db_creds_local.yaml")
-engine = local_connector.init_db_engine(local_creds)
-with engine.connect() as conn:
-    conn.execute(
-        text(
-            """
-                UPDATE
-                    dim_products
-                SET
-                    product_price = REPLACE(product_price, '£', '')
-            """
-        )
-    )
-    conn.commit()
-# %%
-local_connector = DatabaseConnector()
-local_creds = local_connector.read_db_creds("db_creds_local.yaml")
-engine = local_connector.init_db_engine(local_creds)
-with engine.connect() as conn:
-    conn.execute(
-        text(
-            """
-                ALTER TABLE dim_products
-                    ADD COLUMN IF NOT EXISTS weight_class varchar(15);
-
-                UPDATE
-                    dim_products
-                SET
-                    weight_class = CASE
-                                     WHEN weight < 2 THEN 'Light'
-                                     WHEN weight >= 2 AND weight < 40 THEN 'Mid_Sized'
-                                     WHEN weight >= 40 AND weight < 140 THEN 'Heavy'
-                                     WHEN weight >= 140 THEN 'Truck_Required'
-                                    END;
-            """
-        )
-    )
-    conn.commit()
-# %% Milestone 3.5
-local_connector = DatabaseConnector()
-local_creds = local_connector.read_db_creds("db_creds_local.yaml")
-engine = local_connector.init_db_engine(local_creds)
-with engine.connect() as conn:
-    conn.execute(
-        text(
-            """
-                ALTER TABLE dim_products
-                    ALTER COLUMN product_price TYPE float4 USING product_price::real,
-                    ALTER COLUMN weight TYPE float4 USING WEIGHT::real,
-                    ALTER COLUMN "EAN" TYPE varchar(20),
-                    ALTER COLUMN product_code TYPE varchar(20),
-                    ALTER COLUMN date_added TYPE date,
-                    ALTER COLUMN uuid TYPE uuid USING uuid::uuid,
-                    ALTER COLUMN weight_class TYPE varchar(20);
-
-                ALTER TABLE dim_products
-                    RENAME COLUMN removed TO still_available;
-            """
-        )
-    )
-    conn.commit()
 
 
 # %% Milestone 3.6
@@ -171,20 +103,27 @@ with engine.connect() as conn:
     conn.execute(
         text(
             """
-                ALTER TABLE dim_card_details
-                    ADD PRIMARY KEY (card_number);
-                
-                ALTER TABLE dim_date_times
-                    ADD PRIMARY KEY (date_uuid);
-                
-                ALTER TABLE dim_products
-                    ADD PRIMARY KEY (product_code);
-                
-                ALTER TABLE dim_store_details
-                    ADD PRIMARY KEY (store_code);
-                
-                ALTER TABLE dim_users_table
-                    ADD PRIMARY KEY (user_uuid);
+                DO $$
+                DECLARE
+                    dim record;
+                BEGIN
+                    FOR dim IN
+                        SELECT * FROM (VALUES
+                            ('dim_card_details', 'card_key', 'card_number'),
+                            ('dim_date_times', 'date_key', 'date_uuid'),
+                            ('dim_products', 'product_key', 'product_code'),
+                            ('dim_store_details', 'store_key', 'store_code'),
+                            ('dim_users_table', 'user_key', 'user_uuid')
+                        ) AS dims (table_name, primary_key, natural_key)
+                    LOOP
+                        IF to_regclass(dim.table_name || '_pkey') IS NULL THEN
+                            EXECUTE format('ALTER TABLE %I ADD PRIMARY KEY (%I)', dim.table_name, dim.primary_key);
+                        END IF;
+                        IF to_regclass(dim.table_name || '_' || dim.natural_key || '_key') IS NULL THEN
+                            EXECUTE format('ALTER TABLE %I ADD UNIQUE (%I)', dim.table_name, dim.natural_key);
+                        END IF;
+                    END LOOP;
+                END $$;
             """
         )
     )
@@ -200,28 +139,28 @@ with engine.connect() as conn:
             """
                 ALTER TABLE orders_table
                     ADD CONSTRAINT orders_table_card_pkey
-                    FOREIGN KEY(card_number) 
-                    REFERENCES dim_card_details (card_number);
+                    FOREIGN KEY(card_key) 
+                    REFERENCES dim_card_details (card_key);
 
                 ALTER TABLE orders_table
                     ADD CONSTRAINT orders_table_date_pkey
-                    FOREIGN KEY(date_uuid) 
-                    REFERENCES dim_date_times (date_uuid);
+                    FOREIGN KEY(date_key) 
+                    REFERENCES dim_date_times (date_key);
 
                 ALTER TABLE orders_table
                     ADD CONSTRAINT orders_table_product_pkey
-                    FOREIGN KEY(product_code) 
-                    REFERENCES dim_products (product_code);
+                    FOREIGN KEY(product_key) 
+                    REFERENCES dim_products (product_key);
 
                 ALTER TABLE orders_table
                     ADD CONSTRAINT orders_table_store_pkey
-                    FOREIGN KEY(store_code) 
-                    REFERENCES dim_store_details (store_code);
+                    FOREIGN KEY(store_key) 
+                    REFERENCES dim_store_details (store_key);
                 
                 ALTER TABLE orders_table
                     ADD CONSTRAINT orders_table_user_pkey
-                    FOREIGN KEY(user_uuid) 
-                    REFERENCES dim_users_table (user_uuid);
+                    FOREIGN KEY(user_key) 
+                    REFERENCES dim_users_table (user_key);
                 
             """
         )
@@ -238,7 +177,7 @@ with engine.connect() as conn:
             """
                 SELECT s.country_code, COUNT(DISTINCT s.store_code)
                 FROM orders_table o
-                JOIN dim_store_details s ON s.store_code = o.store_code
+                JOIN dim_store_details s ON s.store_key = o.store_key
                 GROUP BY s.country_code
             """
         )
@@ -257,7 +196,7 @@ with engine.connect() as conn:
             """
                 SELECT s.locality, COUNT(DISTINCT s.store_code) as num_stores
                 FROM orders_table o
-                JOIN dim_store_details s ON s.store_code = o.store_code
+                JOIN dim_store_details s ON s.store_key = o.store_key
                 GROUP BY s.locality
                 ORDER BY num_stores DESC
                 LIMIT 7
@@ -278,8 +217,8 @@ with engine.connect() as conn:
             """
                 SELECT ROUND(SUM(o.product_quantity * p.product_price)::NUMERIC, 2)  as total_sales, d.month
                 FROM orders_table o
-                JOIN dim_date_times d ON d.date_uuid = o.date_uuid
-                JOIN dim_products p ON o.product_code = p.product_code
+                JOIN dim_date_times d ON d.date_key = o.date_key
+                JOIN dim_products p ON o.product_key = p.product_key
                 GROUP BY d.month
                 ORDER BY total_sales DESC
                 LIMIT 6
@@ -306,8 +245,8 @@ with engine.connect() as conn:
                         ELSE 'Offline' 
                     END AS location
                 FROM orders_table o
-                JOIN dim_store_details s ON s.store_code = o.store_code
-                JOIN dim_products p ON o.product_code = p.product_code
+                JOIN dim_store_details s ON s.store_key = o.store_key
+                JOIN dim_products p ON o.product_key = p.product_key
                 GROUP BY location
             """
         )
@@ -327,7 +266,7 @@ with engine.connect() as conn:
                 WITH global_products_sold AS (
                     SELECT (SUM(o.product_quantity* p.product_price)) AS total
                     FROM orders_table o
-                    JOIN dim_products p  ON o.product_code = p.product_code
+                    JOIN dim_products p  ON o.product_key = p.product_key
                 )
 
                 SELECT
@@ -335,8 +274,8 @@ with engine.connect() as conn:
                     ROUND(SUM(o.product_quantity * p.product_price)::NUMERIC,2) as total_sales,
                     ROUND(((SUM(o.product_quantity * p.product_price) * 100) / (SELECT total FROM global_products_sold))::NUMERIC, 2) AS percentage_total
                 FROM orders_table o
-                JOIN dim_store_details s ON s.store_code = o.store_code
-                JOIN dim_products p ON o.product_code = p.product_code
+                JOIN dim_store_details s ON s.store_key = o.store_key
+                JOIN dim_products p ON o.product_key = p.product_key
                 GROUP BY s.store_type
                 ORDER BY total_sales DESC;
             """
@@ -358,9 +297,9 @@ with engine.connect() as conn:
                     d.year,
                     d.month
                 FROM orders_table o
-                JOIN dim_store_details s ON s.store_code = o.store_code
-                JOIN dim_products p ON o.product_code = p.product_code
-                JOIN dim_date_times d on d.date_uuid = o.date_uuid
+                JOIN dim_store_details s ON s.store_key = o.store_key
+                JOIN dim_products p ON o.product_key = p.product_key
+                JOIN dim_date_times d on d.date_key = o.date_key
                 GROUP BY d.year, d.month
                 ORDER BY total_sales DESC
                 LIMIT 10;
@@ -406,8 +345,8 @@ with engine.connect() as conn:
                     s.country_code
                     
                 FROM orders_table o
-                JOIN dim_store_details s ON s.store_code = o.store_code
-                JOIN dim_products p ON o.product_code = p.product_code
+                JOIN dim_store_details s ON s.store_key = o.store_key
+                JOIN dim_products p ON o.product_key = p.product_key
                 WHERE s.country_code = 'DE'
                 GROUP BY s.country_code, s.store_type
                 ORDER BY total_sales ASC
@@ -428,22 +367,10 @@ with engine.connect() as conn:
     result = conn.execute(
         text(
             """
-                WITH cte AS (
-                    SELECT
-                        year,
-                        datetime,
-                        LEAD (datetime, 1)
-                        OVER (
-                            PARTITION BY year
-                            ORDER BY datetime
-                        ) as next_datetime
-                    FROM dim_date_times
-                    )
-
                 SELECT
                     year,
-                    AVG(next_datetime - datetime) as actual_time_taken
-                FROM cte
+                    AVG(seconds_to_next_sale) * INTERVAL '1 second' as actual_time_taken
+                FROM dim_date_times
                 GROUP BY year
                 ORDER BY actual_time_taken DESC
                 LIMIT 5;
@@ -1,11 +1,6 @@
 -- Milestone 3.1
--- Altering 'orders_table' with various column type changes
+-- Altering 'orders_table' column types (its foreign keys are integer surrogate keys set at load)
 ALTER TABLE orders_table
-    ALTER COLUMN date_uuid TYPE uuid USING date_uuid::uuid,
-    ALTER COLUMN user_uuid TYPE uuid USING user_uuid::uuid,
-    ALTER COLUMN card_number TYPE varchar(19),
-    ALTER COLUMN store_code TYPE varchar(12),
-    ALTER COLUMN product_code TYPE varchar(11),
     ALTER COLUMN product_quantity TYPE int2;
 
 -- Milestone 3.2
@@ -31,27 +26,6 @@ ALTER TABLE dim_store_details
     ALTER COLUMN country_code TYPE varchar(3),
     ALTER COLUMN continent TYPE varchar(255);
 
--- Milestone 3.4
--- Updating 'dim_products' by removing currency symbol from 'product_price'
-UPDATE
-    dim_products
-SET
-    product_price = REPLACE(product_price, '£', '');
-
--- Milestone 3.5
--- More alterations to 'dim_products' and renaming a column
-ALTER TABLE dim_products
-    ALTER COLUMN product_price TYPE float4 USING product_price::real,
-    ALTER COLUMN weight TYPE float4 USING WEIGHT::real,
-    ALTER COLUMN "EAN" TYPE varchar(20),
-    ALTER COLUMN product_code TYPE varchar(20),
-    ALTER COLUMN date_added TYPE date,
-    ALTER COLUMN uuid TYPE uuid USING uuid::uuid,
-    ALTER COLUMN weight_class TYPE varchar(20);
-
-ALTER TABLE dim_products
-    RENAME COLUMN removed TO still_available;
-
 -- Milestone 3.6
 -- Altering 'dim_date_times' with various column type changes
 ALTER TABLE dim_date_times
@@ -69,62 +43,70 @@ ALTER TABLE dim_card_details
     ALTER COLUMN date_payment_confirmed TYPE date USING date_payment_confirmed::date;
 
 -- Milestone 3.8
--- Adding primary keys to various tables
-ALTER TABLE dim_card_details
-    ADD PRIMARY KEY (card_number);
-
-ALTER TABLE dim_date_times
-    ADD PRIMARY KEY (date_uuid);
-
-ALTER TABLE dim_products
-    ADD PRIMARY KEY (product_code);
-
-ALTER TABLE dim_store_details
-    ADD PRIMARY KEY (store_code);
-
-ALTER TABLE dim_users_table
-    ADD PRIMARY KEY (user_uuid);
+-- Adding surrogate primary keys and unique natural keys to the dimension tables,
+-- skipping the keys the loader already created (<table>_pkey and <table>_<natural key>_key)
+DO $$
+DECLARE
+    dim record;
+BEGIN
+    FOR dim IN
+        SELECT * FROM (VALUES
+            ('dim_card_details', 'card_key', 'card_number'),
+            ('dim_date_times', 'date_key', 'date_uuid'),
+            ('dim_products', 'product_key', 'product_code'),
+            ('dim_store_details', 'store_key', 'store_code'),
+            ('dim_users_table', 'user_key', 'user_uuid')
+        ) AS dims (table_name, primary_key, natural_key)
+    LOOP
+        IF to_regclass(dim.table_name || '_pkey') IS NULL THEN
+            EXECUTE format('ALTER TABLE %I ADD PRIMARY KEY (%I)', dim.table_name, dim.primary_key);
+        END IF;
+        IF to_regclass(dim.table_name || '_' || dim.natural_key || '_key') IS NULL THEN
+            EXECUTE format('ALTER TABLE %I ADD UNIQUE (%I)', dim.table_name, dim.natural_key);
+        END IF;
+    END LOOP;
+END $$;
 
 -- Milestone 3.9
--- Adding foreign key constraints to 'orders_table'
+-- Adding surrogate foreign key constraints to 'orders_table'
 ALTER TABLE orders_table
     ADD CONSTRAINT orders_table_card_pkey
-    FOREIGN KEY(card_number) 
-    REFERENCES dim_card_details (card_number);
+    FOREIGN KEY(card_key) 
+    REFERENCES dim_card_details (card_key);
 
 ALTER TABLE orders_table
     ADD CONSTRAINT orders_table_date_pkey
-    FOREIGN KEY(date_uuid) 
-    REFERENCES dim_date_times (date_uuid);
+    FOREIGN KEY(date_key) 
+    REFERENCES dim_date_times (date_key);
 
 ALTER TABLE orders_table
     ADD CONSTRAINT orders_table_product_pkey
-    FOREIGN KEY(product_code) 
-    REFERENCES dim_products (product_code);
+    FOREIGN KEY(product_key) 
+    REFERENCES dim_products (product_key);
 
 ALTER TABLE orders_table
     ADD CONSTRAINT orders_table_store_pkey
-    FOREIGN KEY(store_code) 
-    REFERENCES dim_store_details (store_code);
+    FOREIGN KEY(store_key) 
+    REFERENCES dim_store_details (store_key);
 
 ALTER TABLE orders_table
     ADD CONSTRAINT orders_table_user_pkey
-    FOREIGN KEY(user_uuid) 
-    REFERENCES dim_users_table (user_uuid);
+    FOREIGN KEY(user_key) 
+    REFERENCES dim_users_table (user_key);
 
 
 -- Milestone 4.1
 -- Query to select country code and count of distinct store codes
 SELECT s.country_code, COUNT(DISTINCT s.store_code)
 FROM orders_table o
-JOIN dim_store_details s ON s.store_code = o.store_code
+JOIN dim_store_details s ON s.store_key = o.store_key
 GROUP BY s.country_code;
 
 -- Milestone 4.2
 -- Query to select locality and count of distinct store codes, ordered and limited
 SELECT s.locality, COUNT(DISTINCT s.store_code) as num_stores
 FROM orders_table o
-JOIN dim_store_details s ON s.store_code = o.store_code
+JOIN dim_store_details s ON s.store_key = o.store_key
 GROUP BY s.locality
 ORDER BY num_stores DESC
 LIMIT 7;
@@ -133,8 +115,8 @@ LIMIT 7;
 -- Query to select total sales and month, ordered and limited
 SELECT ROUND(SUM(o.product_quantity * p.product_price)::NUMERIC, 2)  as total_sales, d.month
 FROM orders_table o
-JOIN dim_date_times d ON d.date_uuid = o.date_uuid
-JOIN dim_products p ON o.product_code = p.product_code
+JOIN dim_date_times d ON d.date_key = o.date_key
+JOIN dim_products p ON o.product_key = p.product_key
 GROUP BY d.month
 ORDER BY total_sales DESC
 LIMIT 6;
@@ -149,8 +131,8 @@ SELECT
         ELSE 'Offline' 
     END AS location
 FROM orders_table o
-JOIN dim_store_details s ON s.store_code = o.store_code
-JOIN dim_products p ON o.product_code = p.product_code
+JOIN dim_store_details s ON s.store_key = o.store_key
+JOIN dim_products p ON o.product_key = p.product_key
 GROUP BY location;
 
 -- Milestone 4.5
@@ -158,7 +140,7 @@ GROUP BY location;
 WITH global_products_sold AS (
     SELECT (SUM(o.product_quantity* p.product_price)) AS total
     FROM orders_table o
-    JOIN dim_products p  ON o.product_code = p.product_code
+    JOIN dim_products p  ON o.product_key = p.product_key
 )
 
 SELECT
@@ -166,8 +148,8 @@ SELECT
     ROUND(SUM(o.product_quantity * p.product_price)::NUMERIC,2) as total_sales,
     ROUND(((SUM(o.product_quantity * p.product_price) * 100) / (SELECT total FROM global_products_sold))::NUMERIC, 2) AS percentage_total
 FROM orders_table o
-JOIN dim_store_details s ON s.store_code = o.store_code
-JOIN dim_products p ON o.product_code = p.product_code
+JOIN dim_store_details s ON s.store_key = o.store_key
+JOIN dim_products p ON o.product_key = p.product_key
 GROUP BY s.store_type
 ORDER BY total_sales DESC;
 
@@ -178,9 +160,9 @@ SELECT
     d.year,
     d.month
 FROM orders_table o
-JOIN dim_store_details s ON s.store_code = o.store_code
-JOIN dim_products p ON o.product_code = p.product_code
-JOIN dim_date_times d on d.date_uuid = o.date_uuid
+JOIN dim_store_details s ON s.store_key = o.store_key
+JOIN dim_products p ON o.product_key = p.product_key
+JOIN dim_date_times d on d.date_key = o.date_key
 GROUP BY d.year, d.month
 ORDER BY total_sales DESC
 LIMIT 10;
@@ -202,31 +184,19 @@ SELECT
     s.country_code
     
 FROM orders_table o
-JOIN dim_store_details s ON s.store_code = o.store_code
-JOIN dim_products p ON o.product_code = p.product_code
+JOIN dim_store_details s ON s.store_key = o.store_key
+JOIN dim_products p ON o.product_key = p.product_key
 WHERE s.country_code = 'DE'
 GROUP BY s.country_code, s.store_type
 ORDER BY total_sales ASC
 LIMIT 10;
 
 -- Milestone 4.9
--- Query with CTE to select year and average actual time taken, ordered and limited
-WITH cte AS (
-    SELECT
-        year,
-        datetime,
-        LEAD (datetime, 1)
-        OVER (
-            PARTITION BY year
-            ORDER BY datetime
-        ) as next_datetime
-    FROM dim_date_times
-    )
-
+-- Query to select year and average time taken between sales, from the gaps computed at load, ordered and limited
 SELECT
     year,
-    AVG(next_datetime - datetime) as actual_time_taken
-FROM cte
+    AVG(seconds_to_next_sale) * INTERVAL '1 second' as actual_time_taken
+FROM dim_date_times
 GROUP BY year
 ORDER BY actual_time_taken DESC
 LIMIT 5;
\ No newline at end of file
@@ -0,0 +1,61 @@
+import pandas as pd
+
+from data_cleaning import DataCleaning
+from data_cleaning_duckdb import DuckDBDataCleaning
+
+DATES = [
+    "2001-03-15",
+    "2001-03-15 10:30:00",
+    "2001/03/15",
+    "March 2001 15",
+    "2001 March 15",
+    "15/03/2001",
+    "03/04/2001",
+    "15 March 2001",
+    "March 15, 2001",
+    "not a date",
+    None,
+]
+
+
+def sample_frame():
+    return pd.DataFrame({"row_id": range(len(DATES)), "date_added": DATES})
+
+
+def clean_with_pandas(df):
+    cleaner = DataCleaning()
+    cleaner.clean_dates(df)
+    return df, cleaner.pop_rejected_rows()
+
+
+def clean_with_duckdb(df):
+    cleaner = DuckDBDataCleaning(threads=1)
+    cleaner.register_source("sample", df)
+    cleaner.clean_dates("sample")
+    cleaned_df = cleaner.record_batches("sample").read_all().to_pandas()
+    rejected_df = cleaner.rejected_batches("sample").read_all().to_pandas()
+    return cleaned_df, rejected_df
+
+
+def by_row_id(df):
+    return df.sort_values("row_id").reset_index(drop=True)
+
+
+def test_clean_dates_matches_between_engines():
+    pandas_df, pandas_rejected = clean_with_pandas(sample_frame())
+    duckdb_df, duckdb_rejected = clean_with_duckdb(sample_frame())
+
+    pd.testing.assert_frame_equal(
+        by_row_id(pandas_df), by_row_id(duckdb_df), check_dtype=False
+    )
+    pd.testing.assert_frame_equal(
+        by_row_id(pandas_rejected), by_row_id(duckdb_rejected), check_dtype=False
+    )
+
+
+def test_clean_dates_keeps_raw_value_of_rejected_rows():
+    _, rejected_df = clean_with_duckdb(sample_frame())
+
+    assert list(rejected_df.columns) == ["row_id", "date_added", "reason_codes"]
+    assert set(rejected_df["date_added"].dropna()) == {"not a date"}
+    assert set(rejected_df["reason_codes"]) == {"INVALID_DATE_ADDED"}
@@ -0,0 +1,123 @@
+import pandas as pd
+from sqlalchemy import create_engine
+
+from data_validation import UUID_PATTERN, DataValidator, reason_codes
+
+USER_UUID = "93caf182-e4e9-4c6f-bebb-358033e72bf6"
+
+
+class StubConnector:
+    """
+    Stands in for a DatabaseConnector, with an in-memory SQLite engine holding the referenced tables.
+    """
+
+    def __init__(self):
+        self.engine = create_engine("sqlite://")
+        pd.DataFrame({"store_code": ["WEB-1388012W", "BL-8387506C"]}).to_sql(
+            "dim_store_details", self.engine, index=False
+        )
+
+
+def validate(df, rules, chunksize=None):
+    return DataValidator(StubConnector()).validate(df, rules, chunksize=chunksize)
+
+
+def test_pattern_rule_rejects_non_matching_and_null_values():
+    df = pd.DataFrame({"user_uuid": [USER_UUID, "not-a-uuid", None]})
+    rules = [
+        {"reason": "INVALID_USER_UUID", "column": "user_uuid", "pattern": UUID_PATTERN}
+    ]
+
+    valid_df, rejected_df = validate(df, rules)
+
+    assert valid_df.index.tolist() == [0]
+    assert rejected_df.index.tolist() == [1, 2]
+    assert rejected_df["reason_codes"].tolist() == ["INVALID_USER_UUID"] * 2
+
+
+def test_length_rule_bounds_are_inclusive():
+    df = pd.DataFrame({"card_number": ["1" * 8, "1" * 9, "1" * 19, "1" * 20]})
+    rules = [{"reason": "INVALID_LENGTH", "column": "card_number", "length": (9, 19)}]
+
+    valid_df, rejected_df = validate(df, rules)
+
+    assert valid_df.index.tolist() == [1, 2]
+    assert rejected_df.index.tolist() == [0, 3]
+
+
+def test_domain_rule_rejects_values_outside_the_domain():
+    df = pd.DataFrame({"country_code": ["GB", "GGB", "US"]})
+    rules = [
+        {
+            "reason": "INVALID_COUNTRY_CODE",
+            "column": "country_code",
+            "domain": ["GB", "US"],
+        }
+    ]
+
+    valid_df, rejected_df = validate(df, rules)
+
+    assert valid_df["country_code"].tolist() == ["GB", "US"]
+    assert rejected_df["country_code"].tolist() == ["GGB"]
+
+
+def test_references_rule_checks_values_against_the_referenced_table():
+    df = pd.DataFrame({"store_code": ["WEB-1388012W", "XX-0000000X", "BL-8387506C"]})
+    rules = [
+        {
+            "reason": "UNKNOWN_STORE_CODE",
+            "column": "store_code",
+            "references": ("dim_store_details", "store_code"),
+        }
+    ]
+
+    valid_df, rejected_df = validate(df, rules)
+
+    assert valid_df.index.tolist() == [0, 2]
+    assert rejected_df["store_code"].tolist() == ["XX-0000000X"]
+    assert rejected_df["reason_codes"].tolist() == ["UNKNOWN_STORE_CODE"]
+
+
+def test_row_failing_several_rules_gets_every_reason_code():
+    df = pd.DataFrame(
+        {"user_uuid": [USER_UUID, "bad", "bad"], "country_code": ["GB", "GB", "XX"]}
+    )
+    rules = [
+        {"reason": "INVALID_USER_UUID", "column": "user_uuid", "pattern": UUID_PATTERN},
+        {"reason": "INVALID_COUNTRY_CODE", "column": "country_code", "domain": ["GB"]},
+    ]
+
+    _, rejected_df = validate(df, rules)
+
+    assert rejected_df["reason_codes"].to_dict() == {
+        1: "INVALID_USER_UUID",
+        2: "INVALID_USER_UUID,INVALID_COUNTRY_CODE",
+    }
+
+
+def test_chunked_and_unchunked_validation_agree():
+    df = pd.DataFrame(
+        {
+            "user_uuid": [USER_UUID, "bad", None, USER_UUID, "bad"] * 3,
+            "country_code": ["GB", "XX", "GB", "DE", None] * 3,
+        }
+    )
+    rules = [
+        {"reason": "INVALID_USER_UUID", "column": "user_uuid", "pattern": UUID_PATTERN},
+        {"reason": "INVALID_COUNTRY_CODE", "column": "country_code", "domain": ["GB"]},
+    ]
+
+    valid_df, rejected_df = validate(df, rules)
+    chunked_valid_df, chunked_rejected_df = validate(df, rules, chunksize=4)
+
+    pd.testing.assert_frame_equal(valid_df, chunked_valid_df)
+    pd.testing.assert_frame_equal(rejected_df, chunked_rejected_df)
+
+
+def test_reason_codes_only_indexes_rejected_rows():
+    masks = {
+        "FIRST": pd.Series([True, False, True]),
+        "SECOND": pd.Series([False, False, True]),
+    }
+
+    assert reason_codes(masks).to_dict() == {0: "FIRST", 2: "FIRST,SECOND"}
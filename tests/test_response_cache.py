@@ -0,0 +1,115 @@
+import pytest
+
+import response_cache
+from response_cache import ResponseCache
+
+NOW = 1_700_000_000.0
+URL = "https://example.com/store_details/1"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    Freezes the clock of the cache module, and lets a test move it forward.
+    """
+    current = {"time": NOW}
+    monkeypatch.setattr(response_cache.time, "time", lambda: current["time"])
+    return current
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    return ResponseCache(path=str(tmp_path / "cache.sqlite"), default_ttl=60)
+
+
+def test_expires_at_no_store_is_not_stored(cache):
+    assert cache.expires_at({"Cache-Control": "no-store"}) is None
+
+
+def test_expires_at_no_cache_expires_immediately(cache):
+    assert cache.expires_at({"Cache-Control": "no-cache"}) == NOW
+
+
+def test_expires_at_max_age_takes_precedence_over_expires(cache):
+    headers = {
+        "Cache-Control": "public, max-age=300",
+        "Expires": "Thu, 01 Jan 1970 00:00:00 GMT",
+    }
+
+    assert cache.expires_at(headers) == NOW + 300
+
+
+def test_expires_at_reads_expires_header(cache):
+    headers = {"Expires": "Tue, 14 Nov 2023 22:23:20 GMT"}
+
+    assert cache.expires_at(headers) == 1_700_000_600.0
+
+
+def test_expires_at_invalid_expires_header_is_stale(cache):
+    assert cache.expires_at({"Expires": "0"}) == NOW
+
+
+def test_expires_at_defaults_to_ttl(cache):
+    assert cache.expires_at({}) == NOW + 60
+
+
+def test_no_store_response_is_not_cached(cache):
+    key = cache.cache_key(URL, {})
+
+    cache.store(key, URL, b"body", {"Cache-Control": "no-store"})
+
+    assert cache.get(key) is None
+
+
+def test_refresh_after_not_modified_extends_freshness(cache, clock):
+    key = cache.cache_key(URL, {})
+    cache.store(key, URL, b"body", {"Cache-Control": "max-age=10", "ETag": '"v1"'})
+    clock["time"] = NOW + 20
+    assert not cache.is_fresh(cache.get(key))
+
+    cache.refresh(key, {"Cache-Control": "max-age=10"})
+
+    entry = cache.get(key)
+    assert cache.is_fresh(entry)
+    assert entry["expires_at"] == NOW + 30
+    assert entry["body"] == b"body"
+    assert cache.conditional_headers(entry) == {"If-None-Match": '"v1"'}
+
+
+def test_refresh_with_no_store_drops_the_entry(cache):
+    key = cache.cache_key(URL, {})
+    cache.store(key, URL, b"body", {})
+
+    cache.refresh(key, {"Cache-Control": "no-store"})
+
+    assert cache.get(key) is None
+
+
+def test_cache_key_separates_api_keys():
+    first = ResponseCache.cache_key(URL, {"x-api-key": "first"})
+    second = ResponseCache.cache_key(URL, {"x-api-key": "second"})
+
+    assert first != second
+    assert first == ResponseCache.cache_key(URL, {"x-api-key": "first"})
+
+
+def test_evict_removes_least_recently_used_entries_until_under_max_bytes(
+    tmp_path, clock
+):
+    cache = ResponseCache(path=str(tmp_path / "cache.sqlite"), max_bytes=35)
+    keys = [cache.cache_key(f"{URL}?page={page}", {}) for page in range(3)]
+    for second, key in enumerate(keys):
+        clock["time"] = NOW + second
+        cache.store(key, URL, b"x" * 10, {})
+    clock["time"] = NOW + 3
+    cache.get(keys[0])
+
+    clock["time"] = NOW + 4
+    cache.store(cache.cache_key(f"{URL}?page=3", {}), URL, b"x" * 20, {})
+
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[2]) is None
+    assert cache.stats["evicted"] == 2
+    (total,) = cache.conn.execute("SELECT SUM(size) FROM responses").fetchone()
+    assert total == 30
@@ -0,0 +1,47 @@
+import json
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ["boto3", "tabula", "aiohttp", "IPython"]
+
+
+def import_in_subprocess(module):
+    """
+    Imports a module in a fresh interpreter.
+
+    Args:
+        module (str): The name of the module to import.
+
+    Returns:
+        dict: The import time in seconds and the top-level packages loaded by the import.
+    """
+    code = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        "elapsed = time.perf_counter() - start\n"
+        "loaded = sorted({name.split('.')[0] for name in sys.modules})\n"
+        "print(json.dumps({'elapsed': elapsed, 'loaded': loaded}))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def test_data_extraction_defers_heavy_imports():
+    result = import_in_subprocess("data_extraction")
+    assert not set(HEAVY_MODULES) & set(result["loaded"])
+    assert result["elapsed"] < 3.0
+
+
+def test_cli_entry_point_imports_no_pipeline_dependencies():
+    result = import_in_subprocess("retail_etl")
+    assert not {"pandas", "sqlalchemy", *HEAVY_MODULES} & set(result["loaded"])
+    assert result["elapsed"] < 0.5